@@ -0,0 +1,252 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from Scanner import Scanner
+from Settings import Settings
+from Tokenizer import Tokenizer
+from Utils import CustomList
+
+
+def nested_generics(depth: int, count: int) -> str:
+    """
+    Объявления вида Dictionary<string, List<Dictionary<string, List<...<int>...>>>> с вложенностью depth
+    :param count: количество объявлений
+    """
+    opening = "Dictionary<string, List<" * (depth // 2)
+    closing = ">>" * (depth // 2)
+    return "".join(f"\t{opening}int{closing} field{i};\n" for i in range(count))
+
+
+def comparison_chain(length: int) -> str:
+    """
+    Один вызов с length аргументами-сравнениями a > b без ';' между ними: старая проверка у каждого '>' заново
+    проходит назад через все предыдущие сравнения
+    """
+    arguments = ", ".join(["a > b"] * length)
+    return f"\tCall({arguments});\n"
+
+
+def nested_blocks(depth: int, braces=True) -> str:
+    """
+    if, вложенные друг в друга depth раз, с телом в фигурных скобках или без них
+    """
+    lines = []
+    for level in range(depth):
+        lines.append("\t" * level + "if (a)")
+        if braces:
+            lines.append("\t" * level + "{")
+    lines.append("\t" * depth + "a = 1;")
+    if braces:
+        lines += ["\t" * level + "}" for level in reversed(range(depth))]
+    return "\n".join(lines) + "\n"
+
+
+# Строка из примерно 20 символов для каждого вида константы
+_LITERAL_PIECES = {
+    "regular": ('"', '{\\"id\\": 1, \\"a\\": 2}', '"'),
+    "verbatim": ('@"', 'SELECT ""id"" FROM t\n', '"'),
+    "raw": ('"""\n', '{"id": 1, "a": [2]}\n', '"""'),
+}
+
+
+def big_literal(kind: str, size: int) -> str:
+    """
+    Присваивание одной строковой константы размером около size символов: JSON с экранированными кавычками
+    в обычной строке ("regular"), многострочный SQL в verbatim строке ("verbatim") или многострочный JSON в raw
+    строке ("raw")
+    """
+    opening, piece, closing = _LITERAL_PIECES[kind]
+    return f"\tstring text = {opening}{piece * (size // len(piece))}{closing};\n\tint after = 1;\n"
+
+
+def measure(function, repeat: int) -> float:
+    """
+    :return: лучшее время выполнения function из repeat запусков в секундах
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_tokenizers(name: str, text: str, repeat: int):
+    """
+    Токенизирует text старым `Tokenizer` и `Scanner` и печатает строку таблицы с временами
+    """
+    settings = Settings()
+    escaped = repr(text)[1:-1]
+    escaped_lines = [repr(line)[1:-1] for line in text.split("\n")]
+    engines = [
+        ("legacy", lambda: Tokenizer(CustomList(escaped), settings, escaped_lines)),
+        ("table", lambda: Scanner(escaped, settings, escaped_lines)),
+        ("raw", lambda: Scanner(text, settings, text.split("\n"), raw=True)),
+    ]
+    cells = []
+    for engine, function in engines:
+        try:
+            cells.append(f"{engine} {measure(function, repeat) * 1000:9.1f} ms")
+        except RecursionError:
+            cells.append(f"{engine} {'recursion':>12}")
+    print(f"{name:<28}" + "  ".join(cells))
+
+
+def angle_brackets(size: int, repeat: int):
+    """
+    Стресс-тест разбора угловых скобок: глубокая вложенность generic типов и длинные цепочки сравнений
+    """
+    for depth in (8, 32, size // 8):
+        run_tokenizers(f"generics depth={depth}", nested_generics(depth, 50), repeat)
+    for length in (100, size // 4, size):
+        run_tokenizers(f"comparisons length={length}", comparison_chain(length), repeat)
+
+
+def literals(size: int, repeat: int):
+    """
+    Замер чтения строковых констант размером до size килобайт
+    """
+    for kind in _LITERAL_PIECES:
+        for kilobytes in (size // 100, size // 10, size):
+            run_tokenizers(f"{kind} {kilobytes} KB", big_literal(kind, kilobytes * 1000), repeat)
+
+
+def lint_text(text: str, settings: Settings):
+    """
+    :return: несовпадения линтера для файла с текстом text
+    """
+    from Linter import Linter
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Benchmark.cs")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        linter = Linter(settings)
+        linter._analyze_file(path)
+    return linter.mismatches
+
+
+def nesting(size: int, repeat: int):
+    """
+    Замер проверки глубоко вложенных блоков, до size уровней
+    """
+    settings = Settings()
+    settings.hard_wrap_at.value = size * 8
+    for braces in (True, False):
+        for depth in (10, size // 10, size):
+            name = f"{'block' if braces else 'line'} depth={depth}"
+            text = nested_blocks(depth, braces)
+            try:
+                print(f"{name:<28}{measure(lambda: lint_text(text, settings), repeat) * 1000:9.1f} ms")
+            except RecursionError:
+                print(f"{name:<28}{'recursion':>12}")
+
+
+class CountingTokens:
+    """
+    Обёртка над токенами файла, которая считает обращения линтера к токенам
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.visits = 0
+
+    def at(self, index: int):
+        self.visits += 1
+        return self.tokens.at(index)
+
+    def __getitem__(self, index):
+        self.visits += 1
+        return self.tokens[index]
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+def count_visits(path: str, settings: Settings, significant: bool) -> int:
+    """
+    Проверяет файл линтером и считает обращения к токенам
+    :param significant: искать ли не пробельные токены и концы блоков по индексам `SignificantTokens`
+     и `BracketPairs` или перебором
+    :return: количество обращений к токенам
+    """
+    from CSFile import CSFile
+    from Linter import Linter
+
+    linter = Linter(settings)
+    linter.file = CSFile(path, settings)
+    linter.tokens = CountingTokens(linter.file.tokens)
+    linter.significant = linter.file.significant_tokens if significant else None
+    linter.brackets = linter.file.bracket_pairs if significant else None
+    linter.analyze()
+    return linter.tokens.visits
+
+
+def visits(directory: str, repeat: int):
+    """
+    Количество обращений к токенам и время проверки файлов directory с индексами не пробельных токенов и без них
+    """
+    settings = Settings()
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".cs"))
+    for significant in (False, True):
+        name = "indexed" if significant else "linear scan"
+        count = sum(count_visits(path, settings, significant) for path in paths)
+        elapsed = measure(lambda: [count_visits(path, settings, significant) for path in paths], repeat)
+        print(f"{name:<28}{count:9} visits {elapsed * 1000:9.1f} ms")
+
+
+def import_times(module: str) -> dict:
+    """
+    Импортирует module в отдельном процессе с `-X importtime`
+    :return: словарь имя модуля -> (собственное время, время вместе с вложенными импортами) в микросекундах
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def startup(top: int, repeat: int):
+    """
+    Время импорта Linter по отчёту `python -X importtime` и самые долгие импорты. Линтер не должен импортировать
+    networkx: он нужен только для компиляции GML в GraphCompiler и в GraphCreator
+    """
+    runs = [import_times("Linter") for _ in range(repeat)]
+    times = min(runs, key=lambda x: x["Linter"][1])
+    print(f"{'import Linter':<28}{times['Linter'][1] / 1000:9.1f} ms")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda x: -x[1][0])[:top]:
+        print(f"  {name:<26}{own / 1000:9.1f} ms  cumulative {cumulative / 1000:9.1f} ms")
+    heavy = sorted(name for name in times if name.split(".")[0] == "networkx")
+    print("networkx is imported" if heavy else "networkx is not imported")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры скорости линтера на искусственных файлах")
+    parser.add_argument("benchmark", choices=["angle", "literals", "startup", "nesting", "visits"], help="Какой замер запустить")
+    parser.add_argument("-s", "--size", type=int, default=2000, help="Размер самого большого входа")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Количество повторов, берётся лучшее время")
+    parser.add_argument("-d", "--directory", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                                                  "TestFiles", "Linter", "CleanFiles"),
+                        help="Папка с файлами для замера visits")
+    args = parser.parse_args()
+    if args.benchmark == "angle":
+        angle_brackets(args.size, args.repeat)
+    elif args.benchmark == "literals":
+        literals(args.size, args.repeat)
+    elif args.benchmark == "startup":
+        startup(10, args.repeat)
+    elif args.benchmark == "nesting":
+        nesting(args.size // 2, args.repeat)
+    elif args.benchmark == "visits":
+        visits(args.directory, args.repeat)
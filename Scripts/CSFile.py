@@ -1,6 +1,7 @@
 import enum
-from Utils import CustomStr, CustomList
+from Utils import BracketPairs, CustomList, SignificantTokens
 from Tokenizer import Tokenizer
+from Scanner import Scanner, TokenStream
 from Settings import Settings
 
 
@@ -15,15 +16,61 @@ class CSFile:
 		self.settings = settings
 		with open(path_to_file, mode='r', encoding='utf8') as f:
 			data = f.read()
+		self._load(data)
+
+		self.type_namespace = Namespaces.Absent
+
+	def _load(self, data: str):
+		"""
+		Разбивает текст файла на строки и токенизирует его выбранным в настройках движком
+		"""
+		if self.settings.tokenizer_engine.value != "legacy" and self.settings.raw_text.value:
+			# Сырой текст: без repr копий и без списка символов
+			self.lines = data.split("\n")
+			self.line_count = len(self.lines)
+			self.tokenizer = Scanner(data, self.settings, self.lines, raw=True, lazy=self.settings.stream_tokens.value)
+		else:
 			temp = data.split("\n")
 			self.line_count = len(temp)
 			self.lines = []
 			for i in range(self.line_count):
 				self.lines.append(repr(temp[i])[1:-1])
-			self.orig = CustomStr(data)
-			self.tokenizer = Tokenizer(CustomList(repr(data)[1:-1]), self.settings, self.lines)
+			if self.settings.tokenizer_engine.value == "legacy":
+				self.tokenizer = Tokenizer(CustomList(repr(data)[1:-1]), self.settings, self.lines)
+			else:
+				self.tokenizer = Scanner(repr(data)[1:-1], self.settings, self.lines,
+										 lazy=self.settings.stream_tokens.value)
+		# При потоковой токенизации линтер читает токены через TokenStream
+		if getattr(self.tokenizer, "lazy", False):
+			self.tokens = TokenStream(self.tokenizer)
+		else:
+			self.tokens = self.tokenizer.tokens
+		self._index_tokens()
 
-		self.type_namespace = Namespaces.Absent
+	def _index_tokens(self):
+		"""
+		Строит индексы ближайших не пробельных токенов и таблицу парных скобок. Для потока токенов их нет, линтер ищет
+		такие токены перебором
+		"""
+		if isinstance(self.tokens, TokenStream):
+			self.significant_tokens = None
+			self.bracket_pairs = None
+		else:
+			self.significant_tokens = SignificantTokens(self.tokens)
+			self.bracket_pairs = BracketPairs(self.tokens)
+
+	def update(self, data: str, first_line: int, last_line: int):
+		"""
+		Заменяет текст файла после правки строк first_line..last_line (номера в новом тексте). Сырой текст
+		перетокенизируется только около правки, в остальных режимах файл разбирается заново.
+		"""
+		if isinstance(self.tokenizer, Scanner) and self.tokenizer.raw and not self.tokenizer.lazy:
+			self.lines = data.split("\n")
+			self.line_count = len(self.lines)
+			self.tokenizer.update(data, first_line, last_line, self.lines)
+			self._index_tokens()
+		else:
+			self._load(data)
 
 	def __getitem__(self, index):
 		return self.lines[index]
@@ -0,0 +1,359 @@
+import enum
+import hashlib
+import os
+import pickle
+
+# Значение data у вершины, на которой заканчивается проверка по графу
+END_NODE = "end_node"
+
+# Версия формата кэша скомпилированных графов. Увеличивается при изменении CompiledGraph или compile_graph
+CACHE_VERSION = 3
+
+
+class Condition(enum.Enum):
+    """
+    Условие на ребре графа: по ребру можно пройти всегда или только при определённом результате кодового слова
+    """
+    default = "default"
+    true = "True"
+    false = "False"
+
+
+class OffsetCheck(enum.Enum):
+    """
+    Значение should_check_offset у вершины, задаётся в GraphCreator
+    """
+    default = "default"
+    true = "true"
+    false = "false"
+
+
+def result_class(res_of_keyword_func) -> int:
+    """
+    :param res_of_keyword_func: результат работы прошлой функции
+    :return: номер набора открытых рёбер: 0 - все рёбра, 1 - default и True, 2 - default и False, 3 - только default
+    """
+    if res_of_keyword_func is None:
+        return 0
+    if res_of_keyword_func == True:
+        return 1
+    if res_of_keyword_func == False:
+        return 2
+    return 3
+
+
+# Представитель каждого набора из result_class для проверки рёбер через passage_allowed
+_RESULT_CLASSES = (None, True, False, "other")
+
+
+def passage_allowed(condition: Condition, res_of_keyword_func) -> bool:
+    """
+    Проверяет, что ребро открыто для прохода по нему
+    :param condition: условие на ребре
+    :param res_of_keyword_func: результат работы прошлой функции
+    :return: True, если разрешён проход и False в противном
+    """
+    if condition is Condition.true and (res_of_keyword_func is not None and res_of_keyword_func != True):
+        return False
+    if condition is Condition.false and (res_of_keyword_func is not None and res_of_keyword_func != False):
+        return False
+    return True
+
+
+class CompiledGraph:
+    """
+    Неизменяемое представление графа правил для проверки кода. Вершины пронумерованы подряд с 0, все свойства
+    вершины лежат в кортежах по её номеру, так что шаг проверки не обращается к networkx.
+    networkx импортируется только при компиляции GML, при чтении графов из кэша он не нужен.
+
+    Переход из вершины детерминирован: transitions[node][result_class(res)] - тройка (table, default, last_data),
+    где table - значение токена -> следующая вершина, default - вершина с кодовым словом или end_node, в которую
+    переходит любой другой токен, last_data - data последней открытой вершины для сообщения об ошибке.
+    Если открытых рёбер нет, last_data равно None, а если у вершины нет следующих вершин, переход равен None
+    """
+    __slots__ = ("name", "data", "offset_checks", "keywords", "handlers", "successors", "conditions", "start_nodes",
+                 "start_index", "transitions", "entries")
+
+    def __init__(self, name: str, data: tuple, offset_checks: tuple, keywords: tuple, successors: tuple,
+                 conditions: tuple, start_nodes: tuple, handlers: dict):
+        """
+        :param name: имя графа, совпадает с именем GML файла
+        :param data: значение data каждой вершины
+        :param offset_checks: should_check_offset каждой вершины
+        :param keywords: имя кодового слова вершины или None, если вершина сравнивается с токеном
+        :param successors: для каждой вершины кортеж следующих за ней вершин
+        :param conditions: для каждой вершины условия на рёбрах к вершинам из successors в том же порядке
+        :param start_nodes: вершины без входящих рёбер
+        :param handlers: словарь обработчиков кодовых слов
+        """
+        self.name = name
+        self.data = data
+        self.offset_checks = offset_checks
+        self.keywords = keywords
+        self.successors = successors
+        self.conditions = conditions
+        self.start_nodes = start_nodes
+        # Значение токена -> первая стартовая вершина с таким data
+        self.start_index = {}
+        for node in start_nodes:
+            self.start_index.setdefault(data[node], node)
+        self.handlers = tuple(handlers[keyword] if keyword is not None else None for keyword in keywords)
+        self.transitions = tuple(self._transitions(node) for node in range(len(data)))
+        # Переход в саму стартовую вершину, с него начинается проверка
+        self.entries = tuple(self._transition((node,)) for node in range(len(data)))
+
+    def _transition(self, candidates: tuple):
+        """
+        :param candidates: открытые для прохода вершины в порядке проверки
+        :return: переход по первой подходящей вершине из candidates
+        """
+        table = {}
+        default = None
+        for node in candidates:
+            if self.keywords[node] is not None or self.data[node] == END_NODE:
+                default = node
+                break
+            table.setdefault(self.data[node], node)
+        return table, default, self.data[candidates[-1]] if candidates else None
+
+    def _transitions(self, node: int) -> tuple:
+        """
+        :return: переходы из вершины node для каждого набора открытых рёбер из result_class
+        """
+        if not self.successors[node]:
+            return (None,) * len(_RESULT_CLASSES)
+        if all(condition is Condition.default for condition in self.conditions[node]):
+            return (self._transition(self.successors[node]),) * len(_RESULT_CLASSES)
+        return tuple(self._transition(tuple(successor for successor, condition
+                                            in zip(self.successors[node], self.conditions[node])
+                                            if passage_allowed(condition, res)))
+                     for res in _RESULT_CLASSES)
+
+    def __repr__(self):
+        return f"CompiledGraph({self.name!r}, nodes={len(self.data)})"
+
+    def fields(self) -> tuple:
+        """
+        :return: аргументы конструктора без обработчиков из одних встроенных типов, для записи в кэш.
+        Перечисления заменены их значениями, чтобы кэш не зависел от того, под каким именем импортирован модуль
+        """
+        return (self.name, self.data, tuple(check.value for check in self.offset_checks), self.keywords,
+                self.successors, tuple(tuple(condition.value for condition in conditions)
+                                       for conditions in self.conditions), self.start_nodes)
+
+    @classmethod
+    def from_fields(cls, fields: tuple, handlers: dict):
+        """
+        :param fields: результат fields()
+        :param handlers: словарь обработчиков кодовых слов
+        :return: восстановленный граф
+        """
+        name, data, offset_checks, keywords, successors, conditions, start_nodes = fields
+        conditions = tuple(tuple(Condition(condition) for condition in node_conditions)
+                           for node_conditions in conditions)
+        return cls(name, data, tuple(OffsetCheck(check) for check in offset_checks), keywords, successors, conditions,
+                   start_nodes, handlers)
+
+
+class CombinedAutomaton:
+    """
+    Все графы в одном пространстве состояний: состояние - номер вершины, сдвинутый на начало её графа.
+    Проверку можно начать по первому токену, не выбирая граф: start_states сразу даёт состояние стартовой вершины.
+    Новые графы только добавляют ключи в start_states, поэтому выбор не замедляется с ростом количества графов.
+    Свойства состояний устроены так же, как в CompiledGraph
+    """
+    __slots__ = ("data", "offset_checks", "handlers", "successors", "conditions", "transitions", "entries", "graphs",
+                 "offsets", "start_states")
+
+    def __init__(self, graphs: list, dispatch_graphs: list):
+        """
+        :param graphs: все графы
+        :param dispatch_graphs: графы из graphs, с которых проверка может начаться по первому токену. Если у двух
+        графов одинаковый стартовый токен, выбирается граф, который раньше в списке
+        """
+        self.offsets = {}
+        data, offset_checks, handlers, successors, conditions, transitions, entries, owners = ([] for _ in range(8))
+        for graph in graphs:
+            offset = self.offsets[graph.name] = len(data)
+            data += graph.data
+            offset_checks += graph.offset_checks
+            handlers += graph.handlers
+            successors += [tuple(offset + node for node in nodes) for nodes in graph.successors]
+            conditions += graph.conditions
+            transitions += [tuple(_shift(transition, offset) for transition in node_transitions)
+                            for node_transitions in graph.transitions]
+            entries += [_shift(transition, offset) for transition in graph.entries]
+            owners += [graph] * len(graph.data)
+        self.data = tuple(data)
+        self.offset_checks = tuple(offset_checks)
+        self.handlers = tuple(handlers)
+        self.successors = tuple(successors)
+        self.conditions = tuple(conditions)
+        self.transitions = tuple(transitions)
+        self.entries = tuple(entries)
+        # Граф, которому принадлежит состояние
+        self.graphs = tuple(owners)
+        # Значение токена -> состояние стартовой вершины графа, проверка по которому начинается с этого токена
+        self.start_states = {}
+        for graph in dispatch_graphs:
+            for value, node in graph.start_index.items():
+                self.start_states.setdefault(value, self.offsets[graph.name] + node)
+
+    def state(self, graph: CompiledGraph, value: str) -> int:
+        """
+        :return: состояние, с которого начинается проверка по графу graph, если первый токен равен value
+        """
+        return self.offsets[graph.name] + graph.start_index.get(value, 0)
+
+
+def _shift(transition, offset: int):
+    """
+    :return: переход CompiledGraph с номерами вершин, сдвинутыми на offset
+    """
+    if transition is None:
+        return None
+    table, default, last_data = transition
+    return ({value: node + offset for value, node in table.items()}, None if default is None else default + offset,
+            last_data)
+
+
+def _offset_check(value) -> OffsetCheck:
+    return OffsetCheck(value) if value in ("default", "true") else OffsetCheck.false
+
+
+def _condition(value) -> Condition:
+    return Condition(value) if value in ("True", "False") else Condition.default
+
+
+def compile_graph(name: str, graph: "nx.DiGraph", handlers: dict) -> CompiledGraph:
+    """
+    Переводит граф из GML в CompiledGraph
+    :param name: имя графа
+    :param graph: граф с вершинами 0..n-1, как после nx.convert_node_labels_to_integers
+    :param handlers: словарь обработчиков кодовых слов. Вершина, data которой есть в словаре, вызывает обработчик
+    вместо сравнения с токеном
+    :return: скомпилированный граф
+    """
+    import networkx as nx
+
+    nodes = range(graph.number_of_nodes())
+    data = tuple(graph.nodes[node]["data"] for node in nodes)
+    # Порядок следующих вершин тот же, что у nx.descendants: от него зависит, какой переход проверяется первым
+    successors = tuple(tuple(successor for successor in nx.descendants(graph, node) if graph.has_edge(node, successor))
+                       for node in nodes)
+    return CompiledGraph(name, data,
+                         tuple(_offset_check(graph.nodes[node].get("should_check_offset")) for node in nodes),
+                         tuple(value if value in handlers else None for value in data),
+                         successors,
+                         tuple(tuple(_condition(graph[node][successor].get("condition"))
+                                     for successor in successors[node]) for node in nodes),
+                         tuple(node for node in nodes if not list(graph.predecessors(node))),
+                         handlers=handlers)
+
+
+def read_graph(path: str) -> "nx.DiGraph":
+    """
+    :param path: путь к GML файлу
+    :return: граф с вершинами, пронумерованными с 0
+    """
+    import networkx as nx
+
+    return nx.DiGraph(nx.convert_node_labels_to_integers(nx.read_gml(path)))
+
+
+def _sources_key(sources: list, handlers: dict) -> str:
+    """
+    :param sources: пары (номер папки/имя файла, содержимое) всех GML файлов
+    :param handlers: словарь обработчиков кодовых слов
+    :return: хэш, который меняется при изменении любого GML файла, набора кодовых слов или формата кэша
+    """
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{' '.join(sorted(handlers))}".encode())
+    for name, content in sources:
+        digest.update(f"\0{name}\0{len(content)}\0".encode())
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def _read_cache(cache_path: str, key: str):
+    """
+    :return: сохранённые поля графов или None, если кэша нет, он повреждён, собран из других GML файлов
+     или ссылается на классы, которых больше нет
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            version, cached_key, fields = pickle.load(f)
+    except (OSError, EOFError, ValueError, TypeError, IndexError, KeyError, AttributeError, ImportError,
+            pickle.UnpicklingError):
+        return None
+    return fields if version == CACHE_VERSION and cached_key == key else None
+
+
+def _write_cache(cache_path: str, key: str, fields: list):
+    """
+    Записывает кэш через временный файл, чтобы параллельные процессы не прочитали его недописанным.
+    Если записать не удалось, например, папка только для чтения, графы просто будут компилироваться при каждом запуске
+    """
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            pickle.dump((CACHE_VERSION, key, fields), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (OSError, TypeError, AttributeError, pickle.PicklingError):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def load_graphs(directories: list, handlers: dict, cache_path=None) -> list:
+    """
+    Читает и компилирует все GML файлы из directories. Если передан cache_path, скомпилированные графы берутся
+    из кэша, собранного из тех же GML файлов, а иначе компилируются и кэш перезаписывается
+    :param directories: папки с GML файлами
+    :param handlers: словарь обработчиков кодовых слов
+    :param cache_path: путь к файлу кэша или None, чтобы не использовать кэш
+    :return: для каждой папки словарь имя графа -> CompiledGraph в порядке os.listdir
+    """
+    paths = [[os.path.join(directory, filename) for filename in os.listdir(directory) if filename.endswith(".gml")]
+             for directory in directories]
+    fields = None
+    if cache_path is not None:
+        sources = []
+        for index, directory_paths in enumerate(paths):
+            for path in directory_paths:
+                with open(path, "rb") as f:
+                    sources.append((f"{index}/{os.path.basename(path)}", f.read()))
+        key = _sources_key(sources, handlers)
+        fields = _read_cache(cache_path, key)
+    if fields is None:
+        fields = [[compile_graph(os.path.splitext(os.path.basename(path))[0], read_graph(path), handlers).fields()
+                   for path in directory_paths]
+                  for directory_paths in paths]
+        if cache_path is not None:
+            _write_cache(cache_path, key, fields)
+    return [{graph_fields[0]: CompiledGraph.from_fields(graph_fields, handlers) for graph_fields in directory_fields}
+            for directory_fields in fields]
+
+
+def report(directories: list, handlers: dict):
+    """
+    Печатает для каждого GML файла количество вершин и количество вершин, переход из которых зависит от результата
+    кодового слова
+    """
+    print(f"{'graph':<28}{'nodes':>7}{'conditional':>13}")
+    for directory in directories:
+        for filename in os.listdir(directory):
+            if filename.endswith(".gml"):
+                name = os.path.splitext(filename)[0]
+                graph = read_graph(os.path.join(directory, filename))
+                compiled = compile_graph(name, graph, handlers)
+                conditional = sum(any(condition is not Condition.default for condition in conditions)
+                                  for conditions in compiled.conditions)
+                print(f"{name:<28}{len(compiled.data):>7}{conditional:>13}")
+
+
+if __name__ == "__main__":
+    from Linter import Linter, graphs_directory
+
+    report([os.path.join(graphs_directory, "Standards"), os.path.join(graphs_directory, "Extensions")],
+           Linter._keywords_to_func)
@@ -1,16 +1,27 @@
 import argparse
-import networkx as nx
 import enum
 import os
+import threading
 import exceptions
+from types import GeneratorType, MappingProxyType
 
 from Settings import Settings
-from Utils import CustomList
+from Suppressions import rule_name
+from Rules import rules, select_rules
+from Utils import BracketPairs, CustomList, SignificantTokens, is_blank, blank_values, blank_element, blank_elements
 from CSFile import CSFile
+from Scanner import TokenStream
+from GraphCompiler import CombinedAutomaton, CompiledGraph, OffsetCheck, END_NODE, load_graphs, passage_allowed, \
+    result_class
 from Tokenizer import Token, KindToken
 from Flag import CategoryStyleRule
 
 cs_file_path = r'TestFiles/Linter/Program.cs'
+graphs_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Graphs")
+# Кэш скомпилированных графов, пересобирается при изменении любого GML файла
+graphs_cache_path = os.path.join(graphs_directory, "compiled.pickle")
+# Графы, после которых _check_line заканчивает строку: у них своё тело или блок
+_statement_graph_names = frozenset(["while", "for", "foreach", "if", "just_block"])
 modifiers = [['public', 'private', 'protected', 'internal', 'protected internal', 'private protected', 'file'],
              ['abstract', 'virtual', 'record', 'partial'],
              ['static'], ['sealed'], ['override'], ['new'], ['extern'], ['unsafe'], ['readonly'], ['volatile']]
@@ -38,20 +49,83 @@ class Graphs(enum.Enum):
     try_catch_finally_ = "try_catch_finally"
 
 
+class MismatchTexts:
+    """
+    Таблица текстов несовпадений одного файла: ожидаемых значений, сообщений и имён проверок.
+    Несовпадение хранит номера текстов и ссылку на таблицу, поэтому таблица живёт, пока живут его несовпадения
+    """
+    __slots__ = ("texts", "ids")
+
+    def __init__(self):
+        self.texts = []
+        self.ids = {}
+
+    def id(self, text: str) -> int:
+        """
+        :return: номер текста в таблице, новый текст добавляется в конец таблицы
+        """
+        result = self.ids.get(text)
+        if result is None:
+            result = self.ids[text] = len(self.texts)
+            self.texts.append(text)
+        return result
+
+    def __getitem__(self, index: int) -> str:
+        return self.texts[index]
+
+    def __len__(self):
+        return len(self.texts)
+
+
 class Mismatch:
     """
-    Класс описания несовпадения в коде. Содержит категорию ошибку, строку, индекс в строке, сообщение
+    Несовпадение в коде. Хранит только индекс в строке, номер строки, значение токена и номера текстов в таблице
+    `MismatchTexts` файла, а строку файла и сообщение собирает при обращении, то есть только при выводе.
+    Если значения токена нет (None), то текст - готовое сообщение, а не ожидаемое значение.
     """
+    __slots__ = ("lines", "texts", "index", "index_line", "value", "text_id", "source_id", "rule")
+
+    mismatched_flag = None
 
-    def __init__(self, category: CategoryStyleRule, line: str, index: int, index_line: int, message: str,
-                 mismatched_flag, expected: str):
-        self.category = category
-        self.line = line
+    def __init__(self, lines: list, texts: MismatchTexts, index: int, index_line: int, value, text_id: int,
+                 source_id: int, rule: str):
+        """
+        :param lines: строки файла
+        :param texts: таблица текстов несовпадений файла
+        :param value: значение токена или None для несовпадения с готовым сообщением
+        :param text_id: номер ожидаемого значения или сообщения в таблице текстов
+        :param source_id: номер имени создавшей несовпадение проверки в таблице текстов
+        :param rule: имя правила, см. `Rules.rules`
+        """
+        self.lines = lines
+        self.texts = texts
         self.index = index
         self.index_line = index_line
-        self.message = message
-        self.expected = expected
-        self.mismatched_flag = mismatched_flag
+        self.value = value
+        self.text_id = text_id
+        self.source_id = source_id
+        self.rule = rule
+
+    @property
+    def line(self) -> str:
+        return self.lines[self.index_line - 1]
+
+    @property
+    def category(self) -> CategoryStyleRule:
+        """
+        Категория правила несовпадения, см. `Rules.rules`
+        """
+        return rules[self.rule].category
+
+    @property
+    def expected(self) -> str:
+        return "" if self.value is None else self.texts[self.text_id]
+
+    @property
+    def message(self) -> str:
+        if self.value is None:
+            return f"{self.texts[self.text_id]} Created by {self.texts[self.source_id]}\n"
+        return f"Expected {self.texts[self.text_id]}, but was '{self.value}'. Created by {self.texts[self.source_id]}\n"
 
     def __str__(self):
         first_part = f"index = {self.index} Line {self.index_line}: "
@@ -62,23 +136,9 @@ class Mismatch:
         return self.__str__()
 
 
-def _check_passage_allowed(graph: nx.DiGraph, index_node: int, next_node_id: int, res_of_keyword_func) -> bool:
-    """
-    Проверяет, что ребро открыто для прохода по нему
-    :param graph: граф
-    :param index_node: индекс стартовой ноды
-    :param next_node_id: индекс следующей ноды
-    :param res_of_keyword_func: результат работы прошлой функции
-    :return: True, если разрешён проход и False в противном
-    """
-    condition = "default"
-    if index_node != next_node_id:
-        condition = graph[index_node][next_node_id]['condition']
-    if condition == "True" and (res_of_keyword_func is not None and res_of_keyword_func != True):
-        return False
-    if condition == "False" and (res_of_keyword_func is not None and res_of_keyword_func != False):
-        return False
-    return True
+# Сколько последних несовпадений не трогать при разборе по ограничениям: их проверки ещё могут удалить сами
+# (см. `_line_or_block`)
+_BUDGET_MARGIN = 32
 
 
 def center_text(text, total_width):
@@ -92,13 +152,96 @@ def center_text(text, total_width):
     return '-' * left_space + text + '-' * right_space
 
 
+class GraphRegistry:
+    """
+    Скомпилированные графы правил, общие для всех экземпляров Linter. Только для чтения: словари обёрнуты
+    в MappingProxyType, графы неизменяемы.
+    Графы состоят из кортежей чисел и строк, поэтому реестр, загруженный до fork, дочерние процессы используют
+    без копирования и повторного чтения
+    """
+    __slots__ = ("graphs", "extension_graphs", "automaton")
+
+    def __init__(self, cache_path=None):
+        """
+        Загружает графы из папок Graphs/Standards и Graphs/Extensions
+        :param cache_path: путь к кэшу скомпилированных графов или None, чтобы скомпилировать графы заново
+        """
+        standards, extensions = load_graphs([os.path.join(graphs_directory, "Standards"),
+                                             os.path.join(graphs_directory, "Extensions")],
+                                            Linter._keywords_to_func, cache_path)
+        self.graphs = MappingProxyType({Graphs(name): graph for name, graph in standards.items()})
+        self.extension_graphs = MappingProxyType({Graphs(name): graph for name, graph in extensions.items()})
+        # Проверка по любому графу идёт по общему автомату, выбирать граф по первому токену можно только из graphs
+        self.automaton = CombinedAutomaton(list(self.graphs.values()) + list(self.extension_graphs.values()),
+                                           list(self.graphs.values()))
+
+
+_registry = None  # type: GraphRegistry|None
+_registry_lock = threading.Lock()
+
+
+def graph_registry() -> GraphRegistry:
+    """
+    :return: общий реестр графов, при первом вызове загружает его из кэша graphs_cache_path
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = GraphRegistry(graphs_cache_path)
+    return _registry
+
+
+def reload_graphs() -> GraphRegistry:
+    """
+    Перечитывает графы из GML файлов, например, после их редактирования в GraphCreator.
+    Уже созданные экземпляры Linter продолжают использовать прежние графы, новые получают перечитанные
+    :return: новый реестр графов
+    """
+    global _registry
+    with _registry_lock:
+        _registry = GraphRegistry(graphs_cache_path)
+    return _registry
+
+
 class Linter:
-    def __init__(self, settings: Settings, file_to_save_mismatches="None", print_to_console=False):
+    # Обработчики кодовых слов в графах. Вызываются с линтером в качестве аргумента, обработчик вложенной проверки
+    # возвращает её генератор
+    _keywords_to_func = {
+        "expression_)": lambda linter: linter._check_expression(conditionals=[")"]),
+        "expression_)_skip_first": lambda linter: linter._check_expression(conditionals=[")"],
+                                                                            skip_first_white_space=True),
+        "expression_;": lambda linter: linter._check_expression(conditionals=[";"]),
+        "expression_;_skip_first": lambda linter: linter._check_expression(conditionals=[";"],
+                                                                            skip_first_white_space=True),
+        "expression_:": lambda linter: linter._check_expression(conditionals=[":"]),
+        "expression_>": lambda linter: linter._check_expression(conditionals=[">"]),
+        "expression_]": lambda linter: linter._check_expression(conditionals=["]"]),
+        "switch_block": lambda linter: linter._check_switch_block(),
+        "identifier": lambda linter: linter._check_identifier(),
+        "type": lambda linter: linter._check_type(),
+        "line": lambda linter: linter._check_line(),
+        "block": lambda linter: linter._analyze(conditionals=["}"]),
+        "block_,": lambda linter: linter._analyze(conditionals=["}"], condition_for_line=[","]),
+        "case_block": lambda linter: linter._analyze(conditionals=["break", "return"]),
+        "increase_offset": lambda linter: linter._increment("current_offset", linter.current_offset),
+        "decrease_offset": lambda linter: linter._decrement("current_offset", linter.current_offset),
+        "line_or_block": lambda linter: linter._line_or_block(),
+        "just_block": lambda linter: linter._just_block(),
+        "initialization": lambda linter: linter._check_initialization(),
+        "check_()_in_catch": lambda linter: linter._check_expression_in_catch()
+    }
+
+    def __init__(self, settings: Settings, file_to_save_mismatches="None", print_to_console=False, profiler=None):
+        """
+        :param profiler: `Profiler`, который замеряет время графов и проверок этого линтера, или None
+        """
         self.setts = settings
         self.mismatches = []
-        self.graphs = {}
-        self.extension_graphs = {}
-        self._parse_graphs()
+        registry = graph_registry()
+        self.graphs = registry.graphs
+        self.extension_graphs = registry.extension_graphs
+        self._automaton = registry.automaton
         self.index_token = 0
         self.tokens = CustomList()
         self.current_offset = 0
@@ -108,34 +251,29 @@ class Linter:
         self.was_private_in_line = False
         self.print_to_console = print_to_console
         self.file = None  # type: CSFile|None
-
-        self._keywords_to_func = {
-            "expression_)": lambda: self._check_expression(conditionals=[")"]),
-            "expression_)_skip_first": lambda: self._check_expression(conditionals=[")"], skip_first_white_space=True),
-            "expression_;": lambda: self._check_expression(conditionals=[";"]),
-            "expression_;_skip_first": lambda: self._check_expression(conditionals=[";"], skip_first_white_space=True),
-            "expression_:": lambda: self._check_expression(conditionals=[":"]),
-            "expression_>": lambda: self._check_expression(conditionals=[">"]),
-            "expression_]": lambda: self._check_expression(conditionals=["]"]),
-            "switch_block": lambda: self._check_switch_block(),
-            "identifier": lambda: self._check_identifier(),
-            "type": lambda: self._check_type(),
-            "line": lambda: self._check_line(),
-            "block": lambda: self.analyze(conditionals=["}"]),
-            "block_,": lambda: self.analyze(conditionals=["}"], condition_for_line=[","]),
-            "case_block": lambda: self.analyze(conditionals=["break", "return"]),
-            "increase_offset": lambda: self._increment("current_offset", self.current_offset),
-            "decrease_offset": lambda: self._decrement("current_offset", self.current_offset),
-            "line_or_block": lambda: self._line_or_block(),
-            "just_block": lambda: self._just_block(),
-            "initialization": lambda: self._check_initialization(),
-            "check_()_in_catch": lambda: self._check_expression_in_catch()
-        }
+        # Тексты несовпадений текущего файла, заводятся заново для каждого файла
+        self.texts = MismatchTexts()
+        # Имена включённых правил, см. флаги enabled_rules и disabled_rules
+        self.rules = frozenset(rules)
+        # Количество несовпадений, не попавших в вывод из-за max_mismatches и max_mismatches_per_rule
+        self.suppressed_mismatches = 0
+        # Несовпадения, которые уже прошли через LINTER:OFF и ограничения, и число попавших в вывод по правилам,
+        # см. `_settle_mismatches`
+        self._kept = []
+        self._rule_counts = {}
+        self._settle_at = None
+        self.profiler = profiler  # type: Profiler|None
+        if profiler is not None:
+            profiler.instrument(self)
+        # Индексы ближайших не пробельных токенов файла, None - если их нет и токены нужно перебирать
+        self.significant = None  # type: SignificantTokens|None
+        # Таблица парных скобок файла, None - если её нет и конец блока нужно искать перебором
+        self.brackets = None  # type: BracketPairs|None
 
     def _just_block(self):
         self._add_mismatches_in_range(self.first_next_not_whitespace_index(), "not whitespace")
         self.index_token -= 1
-        self.check_tokens_by_graph(graph=self.graphs[Graphs.just_block_])
+        yield self._check_tokens_by_graph(graph=self.graphs[Graphs.just_block_])
 
     def _save_mismatches_to_file(self):
         total_width = 110
@@ -147,6 +285,8 @@ class Linter:
             data_to_save += "Mismatches:" + "\n"
             for miss in self.mismatches:
                 data_to_save += f"{miss}\n"
+            if self.suppressed_mismatches:
+                data_to_save += f"{self.suppressed_mismatches} more mismatches suppressed.\n\n"
 
         data_to_save += "-" * total_width + "\n\n"
         if self.file_to_save_mismatches == "None":
@@ -164,15 +304,56 @@ class Linter:
         :return:
         """
         self.file = CSFile(file_path, self.setts)
-        self.tokens = self.file.tokenizer.tokens
+        self.texts = MismatchTexts()
+        self.tokens = self.file.tokens
+        self.significant = self.file.significant_tokens
+        self.brackets = self.file.bracket_pairs
+        self.suppressed_mismatches = 0
+        self._rule_counts = {}
         self.analyze()
+        self._settle_mismatches()
+        self.mismatches, self._kept = self._kept, []
         self._save_mismatches_to_file()
 
+    def _settle_mismatches(self, keep_last=0):
+        """
+        Переносит в _kept несовпадения, которые проверки уже не удалят, то есть все, кроме последних keep_last
+        (см. `_line_or_block`). Несовпадения в строках, где их правило выключено комментарием LINTER:OFF,
+        отбрасываются, а сверх max_mismatches всего и max_mismatches_per_rule для правила только считаются
+        в suppressed_mismatches. Пока проверка идёт, вызывается из `_run`, поэтому на сильно испорченном файле
+        в памяти не копятся несовпадения, которые не попадут в вывод
+        :param keep_last: сколько последних несовпадений оставить в mismatches
+        """
+        count = len(self.mismatches) - keep_last
+        if count <= 0:
+            return
+        suppressions = self.file.tokenizer.suppressions
+        limit = self.setts.max_mismatches.value
+        rule_limit = self.setts.max_mismatches_per_rule.value
+        kept = self._kept
+        rule_counts = self._rule_counts
+        for mismatch in self.mismatches[:count]:
+            rule = mismatch.rule
+            if suppressions and suppressions.is_suppressed(mismatch.index_line, rule):
+                continue
+            rule_count = rule_counts.get(rule, 0)
+            if limit and len(kept) >= limit or rule_limit and rule_count >= rule_limit:
+                self.suppressed_mismatches += 1
+                continue
+            rule_counts[rule] = rule_count + 1
+            kept.append(mismatch)
+        del self.mismatches[:count]
+
     def _reset(self):
         self.mismatches = []
         self.index_token = 0
         self.prev_modifier_id = -1
         self.tokens = CustomList()
+        self.significant = None
+        self.brackets = None
+        self.suppressed_mismatches = 0
+        self._kept = []
+        self._rule_counts = {}
         self.current_offset = 0
         self.was_private_in_line = False
         self.was_public_in_line = False
@@ -195,13 +376,60 @@ class Linter:
 
     def analyze(self, conditionals=None, condition_for_line=[";"]):
         """
-        Анализирует последовательно блоки. Может быть вызван вложено несколько раз
+        Анализирует последовательно блоки
+        :param conditionals: Список значений токенов, при которых прекращается анализ
+        :return:
+        """
+        budget = self.setts.max_mismatches.value or self.setts.max_mismatches_per_rule.value
+        self._settle_at = 4 * _BUDGET_MARGIN if budget else None
+        self.rules = select_rules(self.setts.enabled_rules.value, self.setts.disabled_rules.value)
+        return self._run(self._analyze(conditionals, condition_for_line))
+
+    def _run(self, steps):
+        """
+        Выполняет проверку steps без рекурсии. Проверки, которые могут вкладываться друг в друга (блоки, строки,
+        выражения, обход графа), написаны генераторами: вместо вложенного вызова они отдают через yield генератор
+        вложенной проверки. _run кладёт его на явный стек, выполняет и отправляет результат обратно через send,
+        поэтому глубина вложенности кода не ограничена глубиной стека Python.
+        Если заданы max_mismatches или max_mismatches_per_rule, между шагами накопленные несовпадения разбираются
+        через `_settle_mismatches`
+        :param steps: генератор проверки
+        :return: результат проверки
+        """
+        stack = [steps]
+        value = None
+        error = None
+        while stack:
+            try:
+                if error is None:
+                    call = stack[-1].send(value)
+                else:
+                    call, error = stack[-1].throw(error), None
+            except StopIteration as stop:
+                stack.pop()
+                value, error = stop.value, None
+                continue
+            except Exception as exception:
+                stack.pop()
+                if not stack:
+                    raise
+                error = exception
+                continue
+            if self._settle_at is not None and len(self.mismatches) >= self._settle_at:
+                self._settle_mismatches(keep_last=_BUDGET_MARGIN)
+            stack.append(call)
+            value = None
+        return value
+
+    def _analyze(self, conditionals=None, condition_for_line=[";"]):
+        """
+        Анализирует последовательно блоки. Может быть вызван вложено несколько раз, выполняется через _run
         :param conditionals: Список значений токенов, при которых прекращается анализ
         :return:
         """
         if conditionals is None:
             conditionals = []
-        while self.index_token < len(self.tokens):
+        while self._has_token(self.index_token):
             found = False
             token = self.tokens[self.index_token]
             if token.value == r"\n":
@@ -209,7 +437,7 @@ class Linter:
                 self.index_token += 1
                 self._check_offset()
                 continue
-            if token.value == r"\t" or token.value == " ":
+            if is_blank(token.value):
                 self._check_offset()
             token = self.tokens[self.index_token]
             if token.value in conditionals:
@@ -218,10 +446,9 @@ class Linter:
                 self.index_token += 1
                 return
 
-            graph = self._try_find_graph(token)
-            if graph:
-                name_graph = self._define_name_of_graph(graph)
-                self.check_tokens_by_graph(graph)
+            state = self._automaton.start_states.get(token.value)
+            if state is not None:
+                yield self._check_tokens_from_state(state)
                 found = True
                 # self.index_token += 1
                 token = self.tokens.at(self.index_token)
@@ -237,16 +464,23 @@ class Linter:
                 self.prev_modifier_id = -1
 
             if not found:
-                self._check_line(conditions=condition_for_line)
+                yield self._check_line(conditions=condition_for_line)
 
         if not conditionals:
-            last_token = self.tokens[-1]  # type: Token
-            if last_token.value != r"\n" and self.setts.insert_final_newline.value:
-                self._append_mismatch(last_token.line_index, "Should use final new line.", "analyze")
+            self._check_file_lines()
 
+    def _check_file_lines(self):
+        """
+        Проверки файла по строкам: перевод строки в конце файла и слишком длинные строки
+        """
+        last_token = self.tokens.last() if isinstance(self.tokens, TokenStream) else self.tokens[-1]  # type: Token
+        if "final_newline" in self.rules and last_token.value != r"\n" and self.setts.insert_final_newline.value:
+            self._append_mismatch(last_token.line_index, "Should use final new line.", "analyze", "final_newline")
+
+        if "line_length" in self.rules:
             for line in self.file.tokenizer.too_long_lines:
                 self._append_mismatch(line[0], f"Too long line({line[1]} > {self.setts.hard_wrap_at.value}).",
-                                      "analyze")
+                                      "analyze", "line_length")
 
     def _check_expression_in_catch(self) -> bool:
         next_token = self.tokens[self.first_next_not_whitespace_index()]
@@ -254,8 +488,10 @@ class Linter:
 
     def _check_type(self):
         token = self.tokens[self.index_token]
+        enabled = "type" in self.rules
         while token.kind == KindToken.whiteSpace:
-            self.mismatches.append(self._create_mismatch_by_token(token, "not white space", "_check_type"))
+            if enabled:
+                self.mismatches += self._create_mismatches_by_token(token, "not white space", "_check_type")
             self.index_token += 1
             token = self.tokens[self.index_token]
         if self.tokens[self.index_token].value != "var":
@@ -275,12 +511,12 @@ class Linter:
             return False
         if token.kind == KindToken.identifier or token.kind == KindToken.keyword:
             return False
-        current_token = self.tokens[self.index_token - 1]
-        if current_token.value == "\\n":
+        current_token = self.tokens.at(self.index_token - 1)
+        if current_token is not None and current_token.value == "\\n":
             self._check_offset()
-            del self.mismatches[-1]
-            del self.mismatches[-1]
-            self.check_tokens_by_graph(self.extension_graphs[Graphs.just_block_for_new_])
+            if "offset" in self.rules:
+                del self.mismatches[-2:]
+            yield self._check_tokens_by_graph(self.extension_graphs[Graphs.just_block_for_new_])
             return True
 
         order_tokens = []
@@ -290,7 +526,7 @@ class Linter:
         self._check_order_token_by_array(order_tokens=order_tokens)
         token = self.tokens[self.index_token]
         while token.value != "}":
-            self._check_expression(["}"])
+            yield self._check_expression(["}"])
             token = self.tokens[self.index_token]
             if token.value == "}":
                 break
@@ -303,6 +539,7 @@ class Linter:
         Проверяет последовательность токенов. Используется вместо _check_by_graph, для вызова из кода.
         :param order_tokens: Последовательность токенов
         """
+        enabled = "block_layout" in self.rules
         expected_next_token_index = 0
         while expected_next_token_index < len(order_tokens):
             token = self.tokens[self.index_token]
@@ -312,9 +549,10 @@ class Linter:
             if token.value == order_tokens[expected_next_token_index]:
                 expected_next_token_index += 1
                 continue
-            self.mismatches.append(
-                self._create_mismatch_by_token(token, order_tokens[expected_next_token_index],
-                                               "_check_order_token_by_array", qutie_expected=True))
+            if enabled:
+                self.mismatches.append(
+                    self._create_mismatch_by_token(token, order_tokens[expected_next_token_index],
+                                                   "_check_order_token_by_array", qutie_expected=True))
             if order_tokens[expected_next_token_index] in ["\\n", "\\t", " "]:
                 expected_next_token_index += 1
                 self.index_token -= 1
@@ -324,8 +562,10 @@ class Linter:
         Проверка на идентификатор
         """
         token = self.tokens[self.index_token]
+        enabled = "identifier" in self.rules
         while token.kind == KindToken.whiteSpace:
-            self.mismatches.append(self._create_mismatch_by_token(token, "not white space", "_check_identifier"))
+            if enabled:
+                self.mismatches += self._create_mismatches_by_token(token, "not white space", "_check_identifier")
             self.index_token += 1
             token = self.tokens[self.index_token]
         while token.kind == KindToken.identifier or token.value == ".":
@@ -333,7 +573,7 @@ class Linter:
             token = self.tokens[self.index_token]
 
     def _call_func_by_keyword(self, name: str, args):
-        self._keywords_to_func[name](**args)
+        self._keywords_to_func[name](self, **args)
 
     def _increment(self, name: str, value):
         self.__setattr__(name, value + 1)
@@ -341,27 +581,6 @@ class Linter:
     def _decrement(self, name: str, value):
         self.__setattr__(name, value - 1)
 
-    def _parse_graphs(self):
-        """
-        Записывает все графы из папки Graphs/Standards в список графов для проверки кода
-        :return:
-        """
-        directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Graphs/Standards")
-
-        for filename in os.listdir(directory):
-            if filename.endswith(".gml"):
-                graph_name = os.path.splitext(filename)[0] + "_"
-                graph_path = os.path.join(directory, filename)
-                graph = nx.DiGraph(nx.convert_node_labels_to_integers(nx.read_gml(graph_path)))
-                self.graphs[Graphs[graph_name]] = graph
-        directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Graphs/Extensions")
-        for filename in os.listdir(directory):
-            if filename.endswith(".gml"):
-                graph_name = os.path.splitext(filename)[0] + "_"
-                graph_path = os.path.join(directory, filename)
-                graph = nx.DiGraph(nx.convert_node_labels_to_integers(nx.read_gml(graph_path)))
-                self.extension_graphs[Graphs[graph_name]] = graph
-
     def change_format_rules(self, new_settings: Settings):
         """
         Изменяет флаги описывающие правило стиля кода
@@ -387,10 +606,11 @@ class Linter:
         Проверяет порядок постановки модификаторов, а также пробелы между ними
         :return:
         """
+        enabled = "modifiers" in self.rules
         # Проверка порядка
         curr_id = self.get_modifier_id()
         if self.prev_modifier_id != -1:
-            if curr_id < self.prev_modifier_id:
+            if enabled and curr_id < self.prev_modifier_id:
                 self.mismatches.append(
                     self._create_mismatch_by_token(self.tokens[self.index_token], "Different modifiers order",
                                                    "check_modifiers"))
@@ -407,13 +627,13 @@ class Linter:
         while self.tokens[self.index_token + 1].value.isspace() or self.tokens[self.index_token + 1].value == "\\t":
             self.index_token += 1
             space_count += 1
-            if space_count > 1:
-                self.mismatches.append(
-                    self._create_mismatch_by_token(self.tokens[self.index_token], "Not white Space", "check_modifiers"))
+            if enabled and space_count > 1:
+                self.mismatches.append(self._create_mismatch_by_token(self.tokens[self.index_token], "Not white Space",
+                                                                      "check_modifiers"))
 
-        if space_count == 0:
-            self.mismatches.append(
-                self._create_mismatch_by_token(self.tokens[self.index_token], "White space", "check_modifiers"))
+        if enabled and space_count == 0:
+            self.mismatches.append(self._create_mismatch_by_token(self.tokens[self.index_token], "White space",
+                                                                  "check_modifiers"))
 
     def check_naming(self, token_identifier_after_modifiers_id):
         """
@@ -426,7 +646,7 @@ class Linter:
             if self.tokens[self.index_token].value[0].islower():
                 self.mismatches.append(
                     self._create_mismatch_by_token(self.tokens[self.index_token], "Uppercase first letter",
-                                                   "analyze"))
+                                                   "analyze", rule="naming"))
 
         if ((self.tokens[self.index_token].value == "(" or self.tokens[self.index_token].value == ";") and
                 self.was_private_in_line):
@@ -436,13 +656,13 @@ class Linter:
                 self.mismatches.append(
                     self._create_mismatch_by_token(self.tokens[token_identifier_after_modifiers_id],
                                                    "Lowercase first letter",
-                                                   "analyze"))
+                                                   "analyze", rule="naming"))
             if (self.tokens[token_identifier_after_modifiers_id].value[0].islower()
                     and self.tokens[self.index_token].value == "("):
                 self.mismatches.append(
                     self._create_mismatch_by_token(self.tokens[token_identifier_after_modifiers_id],
                                                    "Uppercase first letter",
-                                                   "analyze"))
+                                                   "analyze", rule="naming"))
 
     def _check_empty_line(self) -> bool:
         """
@@ -453,16 +673,20 @@ class Linter:
         :return: True, если строка пустая(то есть состояла из whitespaces) или первый символ был сразу ;
         """
         index = self.index_token - 1
-        token = self.tokens[index]
-        if token.value == r"\n" or token.value == ";" or token.line_index in self.file.tokenizer.lines_with_comments:
+        token = self.tokens.at(index)
+        if token is None:
+            return True
+        if (token.value == r"\n" or token.value == ";"
+                or self.file.tokenizer.line_table.has_comment(token.line_index)):
             return True
         while index >= 0:
             if self.tokens[index].kind != KindToken.whiteSpace:
                 return False
             if self.tokens[index].value == r"\n":
-                self.mismatches.append(
-                    self._create_mismatch_by_token(self.tokens[index + 1], expected="Remove useless white spaces",
-                                                   called_from="_check_empty_line"))
+                if "empty_line" in self.rules:
+                    self.mismatches.append(
+                        self._create_mismatch_by_token(self.tokens[index + 1], expected="Remove useless white spaces",
+                                                       called_from="_check_empty_line"))
                 return True
             index -= 1
 
@@ -475,15 +699,23 @@ class Linter:
         index = self.index_token
         is_line = False
         token = self.tokens[index]
-        while index < len(self.tokens):
-            token = self.tokens[index]
-            if token.value == "{":
-                break
-            if token.kind != KindToken.whiteSpace:
-                self.current_offset += 1
-                is_line = True
-                break
-            index += 1
+        if self.significant is not None:
+            index = self.significant.next_index(index)
+            if index is not None:
+                token = self.tokens[index]
+                if token.value != "{":
+                    self.current_offset += 1
+                    is_line = True
+        else:
+            while self._has_token(index):
+                token = self.tokens[index]
+                if token.value == "{":
+                    break
+                if token.kind != KindToken.whiteSpace:
+                    self.current_offset += 1
+                    is_line = True
+                    break
+                index += 1
 
         token_to_come_back = self.index_token
         self._roll_back_first_not_white_space_token()
@@ -495,101 +727,76 @@ class Linter:
                 else:
                     break
             self.current_offset -= 1
-            self._check_line()
+            yield self._check_line()
             return is_line
         self.index_token = token_to_come_back
         self._check_offset()
         if is_line:
-            self._check_line()
+            yield self._check_line()
             self.current_offset -= 1
         else:
-            self.check_tokens_by_graph(self.graphs[Graphs.just_block_])
+            yield self._check_tokens_by_graph(self.graphs[Graphs.just_block_])
         return is_line
 
-    @staticmethod
-    def _direct_successors(graph, node):
+    def check_tokens_by_graph(self, graph: CompiledGraph):
         """
-        Вспомогательный метод, чтобы получить следующие вершины в ориентированном графе
-        :param graph: Граф
-        :param node: Вершина из которой исходят ребра
+        Проверяет последовательность токенов по графу.
+        Предполагается что помимо токенов в графе присутствуют кодовые слова, как block или line, для которых определены
+        специальные действия
+        :param graph: граф для сравнения правил и кода
         :return:
         """
-        descendants = nx.descendants(graph, node)
-        if descendants is None:
-            return None
-        direct_successors = [n for n in descendants if graph.has_edge(node, n)]
-        return direct_successors
+        return self._run(self._check_tokens_by_graph(graph))
 
-    @staticmethod
-    def _get_start_nodes(graph) -> []:
+    def _check_tokens_by_graph(self, graph: CompiledGraph):
         """
-        Возвращает начальные вершины графа, то есть вершины без входящих рёбер
-        :param graph: Граф
-        :return:
+        То же, что check_tokens_by_graph, для вызова из других проверок через yield
         """
-        isolated_nodes = [node for node in graph.nodes() if not list(graph.predecessors(node))]
-        return isolated_nodes
+        yield self._check_tokens_from_state(self._automaton.state(graph, self.tokens[self.index_token].value))
 
-    def check_tokens_by_graph(self, graph: nx.DiGraph):
+    def _check_tokens_from_state(self, index_node: int):
         """
-        Проверяет последовательность токенов по графу.
-        Предполагается что помимо токенов в графе присутствуют кодовые слова, как block или line, для которых определены
-        специальные действия
-        :param graph: граф для сравнения правил и кода
+        Проверяет последовательность токенов по общему автомату графов
+        :param index_node: состояние стартовой вершины графа в CombinedAutomaton
         :return:
         """
-
-        # Определяем стартовый индекс вершины
-        index_node = 0
-        for index_start_node in self._get_start_nodes(graph):
-            if self.tokens[self.index_token].value == graph.nodes[index_start_node]["data"]:
-                index_node = index_start_node
-                break
+        automaton = self._automaton
 
         # Некоторые функции могут возвращать True или False, которые будут определять выбор следующей ноды
         # Потому результат нужно куда-то сохранять
         res_of_keyword_func = None
 
-        next_nodes = [index_node]
-        data_to_compair = graph.nodes[index_node]["data"]
-        past_node = index_node
-        while next_nodes and len(next_nodes) > 0:
+        # Переход из вершины выбирается одним поиском по значению токена, см. CompiledGraph
+        transition = automaton.entries[index_node]
+        while transition is not None:
             found = False
             token_to_check = self.tokens.at(self.index_token)
             if token_to_check is None:
                 self.index_token -= 1
                 token_to_check = self.tokens[self.index_token]
-            is_last_node = True
-            for next_node_id in next_nodes:
-                if not _check_passage_allowed(graph, index_node, next_node_id, res_of_keyword_func):
-                    continue
-                is_last_node = False
-                next_node = graph.nodes[next_node_id]
-                data_to_compair = next_node["data"]
-                if data_to_compair == "end_node":
-                    return
+            table, default, data_to_compair = transition
+            if data_to_compair is None:
+                return
 
-                should_check_offset = next_node["should_check_offset"]
-                if data_to_compair in self._keywords_to_func:
-                    res_of_keyword_func = self._keywords_to_func[data_to_compair]()
-                    found = True
-                    index_node = next_node_id
-                    if should_check_offset == "true":
+            next_node_id = table.get(token_to_check.value, default)
+            if next_node_id is not None:
+                if automaton.data[next_node_id] == END_NODE:
+                    return
+                should_check_offset = automaton.offset_checks[next_node_id]
+                handler = automaton.handlers[next_node_id]
+                if handler is not None:
+                    res_of_keyword_func = handler(self)
+                    if type(res_of_keyword_func) is GeneratorType:
+                        res_of_keyword_func = yield res_of_keyword_func
+                    if should_check_offset is OffsetCheck.true:
                         self._check_offset()
-                    break
-                if self._check_token_by_value(data_to_compair, should_check_offset):
-                    index_node = next_node_id
-                    found = True
-                    break
-
-            past_node = index_node
-            next_nodes = self._direct_successors(graph, index_node)
-
-            if is_last_node:
-                return
+                else:
+                    self._check_token_by_value(automaton.data[next_node_id], should_check_offset)
+                index_node = next_node_id
+                found = True
 
             if not found and token_to_check.value == r"\n":
-                if not self._check_empty_line():
+                if not self._check_empty_line() and "layout" in self.rules:
                     self.mismatches.append(
                         self._create_mismatch_by_token(token_to_check, "Not new line", "check_tokens_by_graph"))
                 found = True
@@ -598,24 +805,28 @@ class Linter:
                 self._check_offset()
 
             if not found:
-                expected = graph.nodes[next_nodes[0]]["data"]
+                next_nodes = automaton.successors[index_node]
+                expected = automaton.data[next_nodes[0]]
 
                 if token_to_check.kind == KindToken.whiteSpace:
                     self.index_token += 1
-                    self.mismatches.append(self._create_mismatch_by_token(token=token_to_check, expected=expected,
-                                                                          called_from="check_tokens_by_graph"))
+                    if "layout" in self.rules:
+                        self.mismatches += self._create_mismatches_by_token(token=token_to_check, expected=expected,
+                                                                            called_from="check_tokens_by_graph")
                 elif data_to_compair in [" ", "\\n", "\\t"]:
                     past_node = index_node
                     index_node = next_nodes[0]
-                    if len(next_nodes) > 1:
-                        if _check_passage_allowed(graph, past_node, next_nodes[1], res_of_keyword_func):
-                            index_node = next_nodes[1]
-                    expected = graph.nodes[index_node]["data"]
-                    next_nodes = self._direct_successors(graph, index_node)
-                    self.mismatches.append(self._create_mismatch_by_token(token=token_to_check, expected=expected,
-                                                                          called_from="check_tokens_by_graph"))
+                    if len(next_nodes) > 1 and passage_allowed(automaton.conditions[past_node][1], res_of_keyword_func):
+                        index_node = next_nodes[1]
+                    if "layout" in self.rules:
+                        expected = automaton.data[index_node]
+                        self.mismatches.append(self._create_mismatch_by_token(token=token_to_check, expected=expected,
+                                                                              called_from="check_tokens_by_graph"))
                 else:
-                    raise exceptions.NodeInGraphNotFound(token_to_check, graph_name=self._define_name_of_graph(graph))
+                    raise exceptions.NodeInGraphNotFound(
+                        token_to_check, graph_name=self._define_name_of_graph(automaton.graphs[index_node]))
+
+            transition = automaton.transitions[index_node][result_class(res_of_keyword_func)]
 
     def _check_token_by_value(self, value: str, should_check_offset) -> bool:
         """
@@ -627,26 +838,26 @@ class Linter:
         token_to_check = self.tokens[self.index_token]
         if token_to_check.value == value:
             checked = False
-            if should_check_offset == "true":
+            if should_check_offset is OffsetCheck.true:
                 self._check_offset()
                 checked = True
             self.index_token += 1
             if value == "\\n":
                 self._check_empty_line()
-                if not checked and (should_check_offset == "default" or should_check_offset == "true"):
+                if not checked and should_check_offset is not OffsetCheck.false:
                     self._check_offset()
             return True
         return False
 
-    def _define_name_of_graph(self, graph: nx.DiGraph) -> str:
+    def _define_name_of_graph(self, graph: CompiledGraph) -> str:
         """
-        Определяет имя графа по переданному graph: nx.DiGraph
+        Определяет имя графа по переданному graph
         :param graph: Граф.
         :return: Имя графа
         """
-        for key, item in self.graphs.items():
-            if item == graph:
-                return key
+        key = Graphs(graph.name)
+        if self.graphs.get(key) is graph:
+            return key
         raise exceptions.GraphNotFound(graph)
 
     def _check_expression(self, conditionals=None, skip_first_white_space=False):
@@ -662,21 +873,23 @@ class Linter:
         symbol_index = 0
         enter_count = 0
         was_enter = False
+        enabled = "expression" in self.rules
         while not (token.value in conditionals):
             if token.value == "{":
-                self._check_initialization()
+                yield self._check_initialization()
                 token = self.tokens[self.index_token]
                 count_spaces = 0
 
-            graph = self._try_find_graph(token)
-            if graph:
-                self.check_tokens_by_graph(graph)
+            state = self._automaton.start_states.get(token.value)
+            if state is not None:
+                yield self._check_tokens_from_state(state)
                 token = self.tokens[self.index_token]
                 continue
 
+            values = self._token_values(token)
             # Проверка на пробел в начале
-            if symbol_index == 0 and token.kind == KindToken.whiteSpace and token.value != "\\t":
-                if token.value == " ":
+            if enabled and symbol_index == 0 and token.kind == KindToken.whiteSpace and values[0] != "\\t":
+                if values[0] == " ":
                     if not skip_first_white_space:
                         self.mismatches.append(self._create_mismatch_by_token(token, "Not white Space",
                                                                               called_from="_check_expression"))
@@ -684,33 +897,38 @@ class Linter:
                     self.mismatches.append(self._create_mismatch_by_token(token, "Not white Space",
                                                                           called_from="_check_expression"))
             # Проверка, нужен ли пробел между элементами
-            if self.conditions_for_space():
+            if enabled and self.conditions_for_space():
                 self.mismatches.append(self._create_mismatch_by_token(token, "White Space",
                                                                       called_from="_check_expression"))
 
             # Проверка на исключения, которые не обрабатывает conditions_for_space
             self._check_exceptions(skip_first_white_space)
 
-            if token.value.isspace():
-                count_spaces += 1
-            elif token.value == "\\n":
-                was_enter = True
-                enter_count += 1
-                if enter_count == 1:
-                    self._increment("current_offset", self.current_offset)
-                if not self._check_correct_enter():
+            for index_element, value in enumerate(values):
+                if value.isspace():
+                    count_spaces += 1
+                elif value == "\\n":
+                    was_enter = True
+                    enter_count += 1
                     if enter_count == 1:
-                        self._decrement("current_offset", self.current_offset)
-                    self.mismatches.append(self._create_mismatch_by_token(token, "Not New Line",
+                        self._increment("current_offset", self.current_offset)
+                    if not self._check_correct_enter():
+                        if enter_count == 1:
+                            self._decrement("current_offset", self.current_offset)
+                        if enabled:
+                            self.mismatches.append(self._create_mismatch_by_token(token, "Not New Line",
+                                                                                  called_from="_check_expression"))
+                elif value == "\\t":
+                    if enabled:
+                        self.mismatches.append(self._create_mismatch_by_token(blank_element(token, index_element),
+                                                                              "Not tab",
+                                                                              called_from="_check_expression"))
+                else:
+                    count_spaces = 0
+                if enabled and count_spaces > 1:
+                    self.mismatches.append(self._create_mismatch_by_token(blank_element(token, index_element),
+                                                                          "Not white Space",
                                                                           called_from="_check_expression"))
-            elif token.value == "\\t":
-                self.mismatches.append(self._create_mismatch_by_token(token, "Not tab",
-                                                                      called_from="_check_expression"))
-            else:
-                count_spaces = 0
-            if count_spaces > 1:
-                self.mismatches.append(self._create_mismatch_by_token(token, "Not white Space",
-                                                                      called_from="_check_expression"))
             self.index_token += 1
             token = self.tokens[self.index_token]
             symbol_index += 1
@@ -718,25 +936,28 @@ class Linter:
             if token.value in conditionals and enter_count != 0:
                 self._decrement("current_offset", self.current_offset)
 
-            if token.value not in ["\\n", '\\t']:
+            first_value = self._token_values(token)[0]
+            if first_value not in ["\\n", '\\t']:
                 was_enter = False
 
-            if token.value == "\\t" and was_enter:
+            if first_value == "\\t" and was_enter:
                 self._check_offset()
                 token = self.tokens[self.index_token]
 
             if token.value == "(":
                 self.index_token += 1
-                self._check_expression(")")
+                yield self._check_expression(")")
                 self.index_token += 1
                 token = self.tokens[self.index_token]
 
             # Проверка на пробел в конце
             value = token.value
-            if (value == ":" or value == ")" or value == ";") and self.tokens[self.index_token - 1].value.isspace():
+            previous = self.tokens[self.index_token - 1]
+            previous_values = self._token_values(previous)
+            if enabled and (value == ":" or value == ")" or value == ";") and previous_values[-1].isspace():
                 self.mismatches.append(
-                    self._create_mismatch_by_token(self.tokens[self.index_token - 1], "Not white Space",
-                                                   called_from="_check_expression"))
+                    self._create_mismatch_by_token(blank_element(previous, len(previous_values) - 1),
+                                                   "Not white Space", called_from="_check_expression"))
 
     def _check_correct_enter(self):
         """
@@ -748,7 +969,7 @@ class Linter:
 
         # Проверка предыдущего токена
         while self.index_token > 0:
-            if self.tokens[self.index_token].value not in [" ", "\\n", "\\t"]:
+            if self.tokens[self.index_token].value != "\\n" and not is_blank(self.tokens[self.index_token].value):
                 break
             self.index_token -= 1
 
@@ -759,8 +980,8 @@ class Linter:
             return True
 
         # Проверка следующего токена
-        while self.index_token < len(self.tokens):
-            if self.tokens[self.index_token].value not in [" ", "\\n", "\\t"]:
+        while self._has_token(self.index_token):
+            if self.tokens[self.index_token].value != "\\n" and not is_blank(self.tokens[self.index_token].value):
                 break
             self.index_token += 1
 
@@ -777,7 +998,7 @@ class Linter:
         Условие для постановки пробела в expression(строке)
         """
         current_token = self.tokens[self.index_token]
-        next_token = self.tokens[self.index_token + 1] if self.index_token + 1 < len(self.tokens) else None
+        next_token = self.tokens.at(self.index_token + 1)
 
         if current_token and next_token:
             current_kind = current_token.kind
@@ -829,6 +1050,7 @@ class Linter:
             self._check_offset()
             return
 
+        enabled = "line" in self.rules
         count_spaces = 0
         token_identifier_after_modifiers_id = -1
         was_class = False
@@ -838,21 +1060,18 @@ class Linter:
             if token.value == "{":
                 first_n_tokens = [x.value for x in self._get_first_n_not_white_space_tokens(4)]
                 if "get" in first_n_tokens or "set" in first_n_tokens:
-                    self._check_get_set_block()
+                    yield self._check_get_set_block()
                     return
 
             if token.value in ["get", "set"]:
-                self._check_get_set()
+                yield self._check_get_set()
                 return
 
-            graph = self._try_find_graph(token)
-            if graph:
-                self.check_tokens_by_graph(graph)
+            state = self._automaton.start_states.get(token.value)
+            if state is not None:
+                yield self._check_tokens_from_state(state)
                 token = self.tokens.at(self.index_token)
-                if not token or graph in [self.graphs[Graphs.while_], self.graphs[Graphs.for_],
-                                          self.graphs[Graphs.foreach_],
-                                          self.graphs[Graphs.if_],
-                                          self.graphs[Graphs.just_block_]]:
+                if not token or self._automaton.graphs[state].name in _statement_graph_names:
                     return
                 if token.value in conditions:
                     break
@@ -874,28 +1093,33 @@ class Linter:
                 open_square_bracket_id = -1
 
             # Проверка на пробел между элементами
-            if self.conditions_for_space():
+            if enabled and self.conditions_for_space():
                 self.mismatches.append(
                     self._create_mismatch_by_token(token, "White Space", called_from="_check_line"))
 
             self._check_exceptions(skip_first_white_space=None)
 
-            if token.value.isspace():
-                count_spaces += 1
-            elif token.value == "\\n" and not was_class and not was_attribute:
-                count_spaces = 0
-                self.mismatches.append(self._create_mismatch_by_token(token, "Not New Line", called_from="_check_line"))
-            elif token.value == "\\t":
-                self.mismatches.append(self._create_mismatch_by_token(token, "Not tab",
-                                                                      called_from="_check_line"))
-                count_spaces = 0
-            else:
-                count_spaces = 0
-            if count_spaces > 1:
-                self.mismatches.append(
-                    self._create_mismatch_by_token(token, "Not white Space", called_from="_check_line"))
+            for index_element, value in enumerate(self._token_values(token)):
+                if value.isspace():
+                    count_spaces += 1
+                elif value == "\\n" and not was_class and not was_attribute:
+                    count_spaces = 0
+                    if enabled:
+                        self.mismatches.append(self._create_mismatch_by_token(token, "Not New Line",
+                                                                              called_from="_check_line"))
+                elif value == "\\t":
+                    if enabled:
+                        self.mismatches.append(self._create_mismatch_by_token(blank_element(token, index_element),
+                                                                              "Not tab", called_from="_check_line"))
+                    count_spaces = 0
+                else:
+                    count_spaces = 0
+                if enabled and count_spaces > 1:
+                    self.mismatches.append(self._create_mismatch_by_token(blank_element(token, index_element),
+                                                                          "Not white Space", called_from="_check_line"))
 
-            self.check_naming(token_identifier_after_modifiers_id)
+            if "naming" in self.rules:
+                self.check_naming(token_identifier_after_modifiers_id)
             self.index_token += 1
             token = self.tokens.at(self.index_token)
             if token is None:
@@ -906,12 +1130,12 @@ class Linter:
                 token = self.tokens.at(self.index_token)
 
             if token.value == "{" and was_equal:
-                self._check_initialization()
+                yield self._check_initialization()
                 token = self.tokens[self.index_token]
 
             if token.value == "(":
                 self.index_token += 1
-                self._check_expression(")")
+                yield self._check_expression(")")
                 count_spaces = 0
                 self.index_token += 1
                 token = self.tokens[self.index_token]
@@ -922,10 +1146,11 @@ class Linter:
                     self._check_new_line_after_semicolon()
                     return
                 if first_not_whitespace_token.value == "{":
-                    self.check_tokens_by_graph(self.extension_graphs[Graphs.just_block_for_func_])
+                    yield self._check_tokens_by_graph(self.extension_graphs[Graphs.just_block_for_func_])
                     return
 
-        self.check_naming(token_identifier_after_modifiers_id)
+        if "naming" in self.rules:
+            self.check_naming(token_identifier_after_modifiers_id)
         self.index_token += 1
         if conditions == [";"]:
             self._check_new_line_after_semicolon()
@@ -939,7 +1164,7 @@ class Linter:
         was_attribute = True
         open_square_bracket_id -= 1
         while open_square_bracket_id > 0 and self.tokens[open_square_bracket_id].value != "\\n":
-            if self.tokens[open_square_bracket_id].value != " " and self.tokens[open_square_bracket_id].value != "\\t":
+            if not is_blank(self.tokens[open_square_bracket_id].value):
                 was_attribute = False
                 break
             open_square_bracket_id -= 1
@@ -953,30 +1178,46 @@ class Linter:
         """
         if skip_first_white_space is None:
             skip_first_white_space = False
-        if (self.tokens[self.index_token - 1].kind == KindToken.identifier and self.tokens[
-            self.index_token].value.isspace()
-                and self.tokens[self.index_token].value == "(" or
-                self.tokens[self.index_token - 1].value == "." and self.tokens[self.index_token].value.isspace() or
-                self.tokens[self.index_token].value.isspace() and self.tokens[self.index_token + 1].value == '.' or
-                self.tokens[self.index_token].value.isspace() and (
-                        self.tokens[self.index_token + 1].value == '++' or
-                        self.tokens[self.index_token + 1].value == '--')):
-            if not skip_first_white_space:
-                self.mismatches.append(self._create_mismatch_by_token(self.tokens[self.index_token], "Not white Space",
-                                                                      called_from="_check_expression"))
+        if "expression" not in self.rules:
+            return
+        token = self.tokens[self.index_token]
+        values = self._token_values(token)
+        # Первый символ отступа сравнивается с предыдущим токеном, последний - со следующим
+        previous = self.tokens.at(self.index_token - 1)
+        after_dot = previous is not None and previous.value == "." and values[0].isspace()
+        before_dot = (len(values) > 1 or not after_dot) and values[-1].isspace() and \
+            self.tokens[self.index_token + 1].value in ('.', '++', '--')
+        if skip_first_white_space:
+            return
+        if after_dot:
+            self.mismatches.append(self._create_mismatch_by_token(token, "Not white Space",
+                                                                  called_from="_check_expression"))
+        if before_dot:
+            self.mismatches.append(self._create_mismatch_by_token(blank_element(token, len(values) - 1),
+                                                                  "Not white Space", called_from="_check_expression"))
+
+    @staticmethod
+    def _token_values(token) -> tuple:
+        """
+        :return: значения символов токена-отступа по одному, для остальных токенов - кортеж из значения токена
+        """
+        return (token.kind == KindToken.whiteSpace and blank_values(token.value)) or (token.value,)
 
     def _check_get_set_block(self):
-        close_bracket = self.tokens[self._find_index_first_token_forward("}")]  # type: Token
+        close_index = self.brackets.match(self.index_token) if self.brackets is not None else None
+        if close_index is None:
+            close_index = self._find_index_first_token_forward("}")
+        close_bracket = self.tokens[close_index]  # type: Token
         if close_bracket.line_index == self.tokens[self.index_token].line_index:
             self.index_token += 1
-            self._check_expression(conditionals=["}"], skip_first_white_space=True)
+            yield self._check_expression(conditionals=["}"], skip_first_white_space=True)
             self.index_token += 1
             return
         self._roll_back(kind_token=KindToken.identifier, token_value=None)
         self.index_token += 1
         self._check_order_token_by_array(["\\n", "{"])
         self.index_token -= 1
-        self.check_tokens_by_graph(self.graphs[Graphs.just_block_])
+        yield self._check_tokens_by_graph(self.graphs[Graphs.just_block_])
         return
 
     def _check_get_set(self):
@@ -997,7 +1238,7 @@ class Linter:
         order_tokens += ["{"]
         self._check_order_token_by_array(order_tokens)
         self.index_token -= 1
-        self.check_tokens_by_graph(self.graphs[Graphs.just_block_])
+        yield self._check_tokens_by_graph(self.graphs[Graphs.just_block_])
 
     def _add_mismatches_in_range(self, index_end: int, expected: str):
         """
@@ -1007,24 +1248,16 @@ class Linter:
         :param index_end: индекс конца, после которого ошибки не будут включаться. Сам индекс не входит
         :param expected: ожидаемый токен
         """
-        while self.index_token < index_end:
-            self.mismatches.append(
-                self._create_mismatch_by_token(token=self.tokens[self.index_token], expected=expected,
-                                               called_from="_add_mismatches_in_range"))
-            self.index_token += 1
+        if "extra_whitespace" in self.rules:
+            while self.index_token < index_end:
+                self.mismatches += self._create_mismatches_by_token(token=self.tokens[self.index_token],
+                                                                    expected=expected,
+                                                                    called_from="_add_mismatches_in_range")
+                self.index_token += 1
+        else:
+            self.index_token = max(self.index_token, index_end)
         self.index_token += 1
 
-    def _try_find_graph(self, token: Token) -> nx.DiGraph:
-        """
-        Пытается найти граф по первому токену. Если не находит, то возвращает None
-        :param token: первый токен в графе
-        """
-        for graph in self.graphs.values():  # type: nx.DiGraph
-            for start_node_index in self._get_start_nodes(graph):
-                if graph.nodes[start_node_index]["data"] == token.value:
-                    return graph
-        return None
-
     def _check_new_line_after_semicolon(self):
         """
         Вызвать, когда указатель стоит после токена ";" чтобы проверить,
@@ -1033,23 +1266,29 @@ class Linter:
         token = self.tokens.at(self.index_token)
         if not token:
             return
+        enabled = "new_line_after_semicolon" in self.rules
         while token.kind == KindToken.whiteSpace:
             if token.value != r'\n':
-                self.mismatches.append(self._create_mismatch_by_token(token, expected="new line",
-                                                                      called_from="_check_new_line_after_semicolon"))
+                if enabled:
+                    self.mismatches += self._create_mismatches_by_token(token, expected="new line",
+                                                                        called_from="_check_new_line_after_semicolon")
                 self.index_token += 1
                 token = self.tokens.at(self.index_token)
                 if token is None:
                     return
             else:
                 return
-        self.mismatches.append(
-            self._create_mismatch_by_token(token, expected="new line", called_from="_check_new_line_after_semicolon"))
+        if enabled:
+            self.mismatches.append(self._create_mismatch_by_token(token, expected="new line",
+                                                                  called_from="_check_new_line_after_semicolon"))
 
     def _check_offset(self):
         """
         Проверяет количество отступов в строчке. Для выбора отступа, нужно установить флаг UseTabs в самом линтере
         """
+        if "offset" not in self.rules:
+            self._skip_offset()
+            return
 
         count_tabs = 0
         count_spaces = 0
@@ -1067,20 +1306,34 @@ class Linter:
         indent_style = self.setts.indent_style.value
         indent_size = self.setts.indent_size.value
 
-        while token.value == '\\t' or token.value == ' ':
-            if token.value == '\\t':
-                count_tabs += 1
-                if indent_style == "space":
-                    mismatches.append(
-                        self._create_mismatch_by_token(token, "Should use spaces", called_from="_check_offset"))
-            if token.value == ' ':
-                count_spaces += 1
-                if indent_style == "tab":
-                    mismatches.append(
-                        self._create_mismatch_by_token(token, "Should use tabs", called_from="_check_offset"))
-            if (indent_style == "tab" and count_tabs > self.current_offset
-                    or indent_style == "space" and count_spaces / indent_size > self.current_offset):
-                mismatches.append(self._create_mismatch_by_token(token, "less offset", called_from="_check_offset"))
+        line_table = self.file.tokenizer.line_table
+        if self.index_token == line_table.first_tokens[token.line_index - 1] and is_blank(token.value):
+            # Отступ в начале строки уже посчитан в таблице строк. Если в нём нет ошибок, его токены пропускаются
+            # разом, иначе символы проверяются по одному ниже
+            tabs, spaces = line_table.indentation(token.line_index)
+            if (indent_style == "tab" and spaces == 0 and tabs <= self.current_offset
+                    or indent_style == "space" and tabs == 0 and spaces / indent_size <= self.current_offset):
+                count_tabs, count_spaces = tabs, spaces
+                self.index_token += 1 if len(blank_values(token.value)) > 1 else tabs + spaces
+                token = self.tokens[self.index_token]
+
+        while is_blank(token.value):
+            # Отступ может быть одним токеном из нескольких символов, символы проверяются по одному
+            for index_element, value in enumerate(blank_values(token.value)):
+                if value == '\\t':
+                    count_tabs += 1
+                    if indent_style == "space":
+                        mismatches.append(self._create_mismatch_by_token(
+                            blank_element(token, index_element), "Should use spaces", called_from="_check_offset"))
+                if value == ' ':
+                    count_spaces += 1
+                    if indent_style == "tab":
+                        mismatches.append(self._create_mismatch_by_token(
+                            blank_element(token, index_element), "Should use tabs", called_from="_check_offset"))
+                if (indent_style == "tab" and count_tabs > self.current_offset
+                        or indent_style == "space" and count_spaces / indent_size > self.current_offset):
+                    mismatches.append(self._create_mismatch_by_token(
+                        blank_element(token, index_element), "less offset", called_from="_check_offset"))
             self.index_token += 1
             token = self.tokens[self.index_token]
 
@@ -1098,36 +1351,77 @@ class Linter:
         if token.value == '}':
             self.current_offset += 1
 
+    def _skip_offset(self):
+        """
+        Пропускает отступ так же, как `_check_offset`, но не проверяет его. Используется, когда правило offset выключено
+        """
+        token = self.tokens.at(self.index_token)
+        if token is None or self.first_next_not_whitespace_index() is None:
+            return
+        while is_blank(token.value):
+            self.index_token += 1
+            token = self.tokens[self.index_token]
+
     def _create_mismatch_by_token(self, token: Token, expected: str, called_from: str,
-                                  qutie_expected=False) -> Mismatch:
+                                  qutie_expected=False, rule=None) -> Mismatch:
         """
         Создает объект
         :param token:
         :param expected:
         :param called_from:
         :param qutie_expected:
+        :param rule: имя правила, если оно не совпадает с именем проверки called_from без приставки _check_
         :return:
         """
-        if qutie_expected:
-            expected = f"'{expected}'"
-        return Mismatch(CategoryStyleRule.CR, self.file.lines[token.line_index - 1], token.start_index,
-                        token.line_index, f"Expected {expected}, but was '{token.value}'. Created by {called_from}\n",
-                        None, expected=expected)
+        token = blank_element(token, 0)
+        return Mismatch(self.file.lines, self.texts, token.start_index, token.line_index, token.value,
+                        self.texts.id(f"'{expected}'" if qutie_expected else expected), self.texts.id(called_from),
+                        rule or rule_name(called_from))
 
-    def _append_mismatch(self, index_line: int, message: str, called_from: str):
-        self.mismatches.append(
-            Mismatch(CategoryStyleRule.CR, self.file.lines[index_line - 1], 0, index_line,
-                     message + f" Created by {called_from}\n", None, expected=""))
+    def _create_mismatches_by_token(self, token: Token, expected: str, called_from: str) -> list:
+        """
+        Создает по несовпадению на каждый символ токена-отступа, для остальных токенов одно несовпадение
+        """
+        return [self._create_mismatch_by_token(element, expected, called_from) for element in blank_elements(token)]
+
+    def _append_mismatch(self, index_line: int, message: str, called_from: str, rule=None):
+        self.mismatches.append(Mismatch(self.file.lines, self.texts, 0, index_line, None, self.texts.id(message),
+                                        self.texts.id(called_from), rule or rule_name(called_from)))
 
     def _check_switch_block(self):
-        while self.index_token < len(self.tokens):
+        if self.significant is not None and self.brackets is not None:
+            yield self._check_switch_block_indexed()
+            return
+        while self._has_token(self.index_token):
             token = self.tokens[self.index_token]
             if token.value == "case" or token.value == "default":
-                self.check_tokens_by_graph(self.graphs[Graphs.case_])
+                yield self._check_tokens_by_graph(self.graphs[Graphs.case_])
             if token.value == "}":
                 break
             self.index_token += 1
 
+    def _check_switch_block_indexed(self):
+        """
+        То же, что `_check_switch_block`, но без перебора пробельных токенов: между метками указатель переходит сразу
+        к следующему не пробельному токену, а после закрывающей скобки switch не идёт
+        """
+        opening = self.significant.previous_index(self.index_token - 1)
+        end = self.brackets.match(opening) if opening is not None and self.tokens[opening].value == "{" else None
+        if end is None:
+            end = len(self.brackets) - 1
+        following = self.significant.next
+        while self.index_token <= end:
+            self.index_token = following[self.index_token]
+            if self.index_token < 0:
+                self.index_token = len(following)
+                return
+            token = self.tokens[self.index_token]
+            if token.value == "case" or token.value == "default":
+                yield self._check_tokens_by_graph(self.graphs[Graphs.case_])
+            if token.value == "}":
+                return
+            self.index_token += 1
+
     def _roll_back(self, token_value: str, kind_token: KindToken):
         """
         Откатывает указатель назад
@@ -1148,6 +1442,9 @@ class Linter:
         """
         Откатывает указатель назад
         """
+        if self.significant is not None and 0 < self.index_token < len(self.significant):
+            self.index_token = max(self.significant.previous[self.index_token], 0)
+            return
         while self.index_token > 0:
             if self.tokens[self.index_token].kind != KindToken.whiteSpace:
                 return
@@ -1161,7 +1458,7 @@ class Linter:
         :return: индекс найденного токена
         """
         index = self.index_token
-        while index < len(self.tokens):
+        while self._has_token(index):
             if self.tokens[index].value == token_value:
                 return index
             index += 1
@@ -1172,12 +1469,21 @@ class Linter:
         Не меняет текущий указатель.
         :return: Индекс первого не пробельного типа впереди указателя
         """
+        if self.significant is not None:
+            return self.significant.next_index(self.index_token)
         index = self.index_token
-        while index < len(self.tokens):
+        while self._has_token(index):
             if self.tokens[index].kind != KindToken.whiteSpace:
                 return index
             index += 1
 
+    def _has_token(self, index: int) -> bool:
+        """
+        Проверяет, что токен с таким индексом существует. В отличие от len(self.tokens) работает и для потока токенов,
+        длина которого заранее не известна.
+        """
+        return self.tokens.at(index) is not None
+
     def _get_first_n_not_white_space_tokens(self, count_tokens: int) -> list:
         """
         Возвращает список из первых n не пробельных символов. Начинает набор с self.index_token
@@ -1186,7 +1492,14 @@ class Linter:
         """
         res = []
         i_t = self.index_token
-        while len(res) < count_tokens and i_t < len(self.tokens):
+        if self.significant is not None:
+            following = self.significant.next
+            while len(res) < count_tokens and 0 <= i_t < len(following) and following[i_t] >= 0:
+                i_t = following[i_t]
+                res.append(self.tokens[i_t])
+                i_t += 1
+            return res
+        while len(res) < count_tokens and self._has_token(i_t):
             if self.tokens[i_t].kind != KindToken.whiteSpace:
                 res.append(self.tokens[i_t])
             i_t += 1
@@ -1205,13 +1518,21 @@ def main():
                         nargs='?',
                         default="mismatches.txt")
     parser.add_argument("-p", "--print", help="Вывести результат в консоль", action="store_true")
+    parser.add_argument("--profile", help="Замерить время графов и проверок по всем файлам и вывести таблицу в консоль "
+                                          "или сохранить в JSON файл по указанному пути", type=str, nargs='?',
+                        const="", default=None)
 
     args = parser.parse_args()
 
     settings = Settings()
     settings.read_flags_from_file(args.config)
 
-    linter = Linter(settings, args.save_file, args.print)
+    profiler = None
+    if args.profile is not None:
+        # Профилировщик тянет inspect, json и copy, поэтому загружается только с --profile
+        from Profiler import Profiler
+        profiler = Profiler()
+    linter = Linter(settings, args.save_file, args.print, profiler)
 
     testing = False
 
@@ -1223,6 +1544,12 @@ def main():
     if testing:
         print("Run on file:///" + os.path.abspath(cs_file_path).replace("\\", "/"))
 
+    if profiler is not None:
+        if args.profile:
+            profiler.save_json(args.profile)
+        else:
+            print(profiler.table())
+
     return 0
 
 
@@ -0,0 +1,130 @@
+import copy
+import inspect
+import json
+from time import perf_counter
+
+# Методы Linter, время которых замеряется отдельно: вспомогательные проверки и проверки, которые вызываются не только
+# из кодовых слов графов
+profiled_methods = ["_analyze", "_check_line", "_check_expression", "_check_initialization", "_line_or_block",
+                    "_check_offset", "_check_empty_line", "check_naming", "check_modifiers", "_check_token_by_value",
+                    "_check_new_line_after_semicolon", "_add_mismatches_in_range", "_check_file_lines"]
+
+
+class Profiler:
+    """
+    Замер времени и количества вызовов графов, обработчиков кодовых слов и проверок Linter. Профилировщик подменяет
+    методы у одного экземпляра Linter обёртками, поэтому без него линтер работает как раньше, без лишних вызовов.
+    Результаты копятся по всем файлам, которые проверил этот экземпляр.
+    Время total включает вложенные проверки, own - нет
+    """
+
+    def __init__(self):
+        # Имя -> [количество вызовов, общее время, собственное время] в секундах
+        self.stats = {}
+        # Время вложенных замеров для каждого открытого замера
+        self._children = []
+
+    def instrument(self, linter):
+        """
+        Подменяет у linter проверки из profiled_methods и обработчики кодовых слов обёртками с замером времени
+        """
+        for name in profiled_methods:
+            method = getattr(linter, name)
+            if inspect.isgeneratorfunction(method):
+                setattr(linter, name, self._wrap_steps(f"check {name}", method))
+            else:
+                setattr(linter, name, self._wrap(f"check {name}", method))
+
+        check_tokens_from_state = linter._check_tokens_from_state
+        owners = linter._automaton.graphs
+
+        def graph_steps(index_node: int):
+            return self._measure_steps(f"graph {owners[index_node].name}", check_tokens_from_state(index_node))
+        linter._check_tokens_from_state = graph_steps
+
+        automaton = copy.copy(linter._automaton)
+        automaton.handlers = tuple(None if handler is None else self._wrap_handler(f"keyword {data}", handler)
+                                   for data, handler in zip(automaton.data, automaton.handlers))
+        linter._automaton = automaton
+
+    def _wrap(self, name: str, function):
+        def wrapper(*args, **kwargs):
+            return self._measure(name, function, *args, **kwargs)
+        return wrapper
+
+    def _wrap_steps(self, name: str, function):
+        def wrapper(*args, **kwargs):
+            return self._measure_steps(name, function(*args, **kwargs))
+        return wrapper
+
+    def _wrap_handler(self, name: str, handler):
+        def wrapper(linter):
+            self._enter()
+            start = perf_counter()
+            result = handler(linter)
+            if inspect.isgenerator(result):
+                self._exit(name, start)
+                return self._measure_steps(name, result, count=False)
+            self._exit(name, start)
+            return result
+        return wrapper
+
+    def _enter(self):
+        self._children.append(0.0)
+
+    def _exit(self, name: str, start: float, count=True):
+        elapsed = perf_counter() - start
+        children = self._children.pop()
+        if self._children:
+            self._children[-1] += elapsed
+        record = self.stats.get(name)
+        if record is None:
+            record = self.stats[name] = [0, 0.0, 0.0]
+        record[0] += count
+        record[1] += elapsed
+        record[2] += elapsed - children
+
+    def _measure(self, name: str, function, *args, **kwargs):
+        self._enter()
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self._exit(name, start)
+
+    def _measure_steps(self, name: str, steps, count=True):
+        """
+        Замеряет проверку-генератор, которую выполняет Linter._run: вложенные проверки, отданные через yield,
+        выполняются между шагами и входят во время этой проверки
+        """
+        self._enter()
+        start = perf_counter()
+        try:
+            return (yield from steps)
+        finally:
+            self._exit(name, start, count)
+
+    def rows(self) -> list:
+        """
+        :return: строки (имя, вызовы, общее время, собственное время) по убыванию собственного времени
+        """
+        return sorted(((name, calls, total, own) for name, (calls, total, own) in self.stats.items()),
+                      key=lambda row: (-row[3], row[0]))
+
+    def table(self) -> str:
+        """
+        :return: таблица замеров для вывода в консоль, время в миллисекундах
+        """
+        own_sum = sum(row[3] for row in self.rows()) or 1.0
+        lines = [f"{'name':<44}{'calls':>10}{'total ms':>12}{'own ms':>12}{'own %':>8}"]
+        for name, calls, total, own in self.rows():
+            lines.append(f"{name:<44}{calls:>10}{total * 1000:>12.1f}{own * 1000:>12.1f}{own / own_sum * 100:>8.1f}")
+        return "\n".join(lines)
+
+    def save_json(self, path: str):
+        """
+        Сохраняет замеры в JSON: имя -> {"calls", "total", "own"}, время в секундах
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({name: {"calls": calls, "total": total, "own": own} for name, calls, total, own in self.rows()},
+                      f, indent=2)
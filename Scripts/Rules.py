@@ -0,0 +1,90 @@
+from Flag import CategoryStyleRule
+from exceptions import UnknownRule
+
+
+class Rule:
+    """
+    Правило стиля. По имени правило включают и выключают флагами enabled_rules и disabled_rules
+    и отключают в участке файла комментарием LINTER:OFF
+    """
+    __slots__ = ("name", "category", "description")
+
+    def __init__(self, name: str, category: CategoryStyleRule, description: str):
+        self.name = name
+        self.category = category
+        self.description = description
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.category.name})"
+
+
+_types = CategoryStyleRule
+
+# Все правила линтера. Имя правила - имя создающей несовпадения проверки без приставки _check_
+# или имя из internal_rule_names
+rules = {rule.name: rule for rule in [
+    Rule("offset", _types.FR, "Отступы в начале строки"),
+    Rule("empty_line", _types.FR, "Пустая строка без пробельных символов"),
+    Rule("line", _types.FR, "Пробелы и переводы строки внутри строки кода"),
+    Rule("expression", _types.FR, "Пробелы в выражениях"),
+    Rule("new_line_after_semicolon", _types.FR, "Перевод строки после ';'"),
+    Rule("extra_whitespace", _types.FR, "Лишние пробельные символы между токенами"),
+    Rule("layout", _types.FR, "Расположение токенов в конструкциях по графам"),
+    Rule("block_layout", _types.FR, "Расположение токенов в блоках get/set и инициализации"),
+    Rule("final_newline", _types.FR, "Перевод строки в конце файла"),
+    Rule("line_length", _types.FR, "Длина строки, см. флаг hard_wrap_at"),
+    Rule("identifier", _types.CR, "Пробельные символы перед идентификатором"),
+    Rule("type", _types.CR, "Пробельные символы перед типом"),
+    Rule("modifiers", _types.CR, "Порядок модификаторов и пробелы между ними"),
+    Rule("naming", _types.NR, "Регистр первой буквы имён полей и методов"),
+]}
+
+# Внутренние имена проверок -> имена правил, под которыми их включают и выключают
+internal_rule_names = {
+    "add_mismatches_in_range": "extra_whitespace",
+    "check_tokens_by_graph": "layout",
+    "order_token_by_array": "block_layout",
+    "check_modifiers": "modifiers",
+}
+
+# Имена, которые объединяют несколько правил. analyze - прежнее общее имя проверок файла целиком и имён
+rule_groups = {
+    "analyze": frozenset(["final_newline", "line_length", "naming"]),
+}
+
+
+def expand_rules(names) -> frozenset:
+    """
+    :param names: имена правил, групп правил или категорий (CR, FR, NR, OR)
+    :return: имена правил
+    """
+    result = set()
+    for name in names:
+        if name in rules:
+            result.add(name)
+        elif name in rule_groups:
+            result |= rule_groups[name]
+        elif name in _types.__members__:
+            result |= {rule.name for rule in rules.values() if rule.category is _types[name]}
+        else:
+            raise UnknownRule(name, sorted(rules))
+    return frozenset(result)
+
+
+def _split(value: str) -> list:
+    return [name.strip() for name in str(value).split(",") if name.strip()]
+
+
+def select_rules(enabled: str, disabled: str) -> frozenset:
+    """
+    Выбирает правила по флагам enabled_rules и disabled_rules
+    :param enabled: имена правил, групп или категорий через запятую, "all" - все правила
+    :param disabled: имена правил, групп или категорий через запятую, которые нужно выключить, "none" - ни одного
+    :return: имена включённых правил
+    """
+    enabled_names = _split(enabled)
+    disabled_names = _split(disabled)
+    selected = frozenset(rules) if enabled_names in ([], ["all"]) else expand_rules(enabled_names)
+    if disabled_names in ([], ["none"]):
+        return selected
+    return selected - expand_rules(disabled_names)
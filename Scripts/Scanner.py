@@ -0,0 +1,772 @@
+import os
+import re
+import string
+import sys
+from bisect import bisect_left
+
+from Settings import Settings
+from Suppressions import Suppressions
+from exceptions import StreamWindowExceeded, UnexpectedChar
+from Tokenizer import Tokenizer
+from Utils import *
+
+_IDENTIFIER = re.compile(r'[^\W\d]+')
+_NUMBER = re.compile(r'\d[\dfldEe.]*')
+_PUNCTUATION_CHARS = ';:,.()[]{}?#'
+_OPERATOR_CHARS = '+-*%=&|!^~'
+_QUOTES = '"\''
+_BLANK_RUN = re.compile(r'[\t ]+')
+_INDENT = re.compile(r'[\t ]*')
+# В сыром тексте управляющие символы приводятся к тем же значениям токенов, что получаются после repr
+_RAW_CONTROL_CHARS = {'\t': r'\t', '\r': r'\r', '\f': r'\f', '\v': r'\v'}
+# Элемент стека угловых скобок для любого оператора, кроме '<'
+_NOT_ANGLE = (-1, False)
+# Содержимое строковых констант после открывающей кавычки до закрывающей
+_REGULAR_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_CHAR_BODY = re.compile(r"[^'\\]*(?:\\.[^'\\]*)*", re.S)
+_VERBATIM_BODY = re.compile(r'[^"]*(?:""[^"]*)*')
+_RAW_QUOTES = re.compile(r'"{3,}')
+# Символы, на которых нужно остановиться внутри интерполированной строки и внутри выражения в {}
+_INTERPOLATED_STOP = re.compile(r'[\\"{]')
+_VERBATIM_INTERPOLATED_STOP = re.compile(r'["{]')
+_HOLE_STOP = re.compile(r'[{}"\'$@]')
+
+
+def literal_end(text: str, pos: int) -> int:
+    """
+    Находит конец строковой или символьной константы C#, не разбирая её посимвольно: обычные строки и символы
+    с экранированием через \\, verbatim строки @"..." с удвоенными кавычками, интерполированные строки $"..." и $@"..."
+    с вложенными константами внутри {}, а также raw строки C# 11, открытые тремя и более кавычками.
+    :param text: исходный текст
+    :param pos: индекс начала константы, включая префиксы $ и @
+    :return: индекс символа после закрывающей кавычки или длина текста, если константа не закрыта
+    """
+    quote_index = pos
+    while quote_index < len(text) and text[quote_index] in '$@':
+        quote_index += 1
+    prefix = text[pos:quote_index]
+    if text[quote_index] == "'":
+        return min(_CHAR_BODY.match(text, quote_index + 1).end() + 1, len(text))
+    verbatim = '@' in prefix
+    quotes = None if verbatim else _RAW_QUOTES.match(text, quote_index)
+    if quotes is not None:
+        end = text.find(quotes.group(), quotes.end())
+        return len(text) if end == -1 else end + len(quotes.group())
+    if '$' in prefix:
+        return _interpolated_end(text, quote_index + 1, verbatim)
+    body = _VERBATIM_BODY if verbatim else _REGULAR_BODY
+    return min(body.match(text, quote_index + 1).end() + 1, len(text))
+
+
+def _interpolated_end(text: str, pos: int, verbatim: bool) -> int:
+    """
+    Находит конец интерполированной строки, пропуская выражения в {} вместе с вложенными в них константами.
+    :param pos: индекс символа после открывающей кавычки
+    """
+    stop = _VERBATIM_INTERPOLATED_STOP if verbatim else _INTERPOLATED_STOP
+    depth = 0
+    while True:
+        match = (_HOLE_STOP if depth else stop).search(text, pos)
+        if match is None:
+            return len(text)
+        pos = match.start()
+        char = text[pos]
+        if depth:
+            # Внутри выражения: считаем скобки и пропускаем вложенные константы целиком
+            if char in _QUOTES:
+                pos = literal_end(text, pos)
+            elif char in '$@':
+                start = pos
+                while pos < len(text) and text[pos] in '$@':
+                    pos += 1
+                if pos < len(text) and text[pos] in _QUOTES:
+                    pos = literal_end(text, start)
+            else:
+                depth += 1 if char == '{' else -1
+                pos += 1
+        elif char == '\\':
+            pos += 2
+        elif char == '"':
+            if verbatim and text.startswith('""', pos):
+                pos += 2
+            else:
+                return pos + 1
+        elif text.startswith('{{', pos):
+            pos += 2
+        else:
+            depth = 1
+            pos += 1
+
+
+class Scanner(Tokenizer):
+    """
+    Табличный сканер исходного кода. Выдаёт ту же последовательность токенов, что и `Tokenizer`, но вместо перебора
+    всех проверок для каждого символа выбирает обработчик по первому символу лексемы из таблицы `_dispatch`,
+    а длинные лексемы (идентификаторы, числа, строки, комментарии) читает срезами исходной строки.
+
+    В режиме `raw` сканер работает прямо с прочитанным текстом файла: переводы строк и табуляции настоящие, а позиции
+    в строке считаются по реальным смещениям. Значения пробельных токенов при этом те же (r'\n', r'\t'), что и в
+    экранированном режиме, поэтому линтер и графы работают одинаково в обоих режимах.
+
+    Токены складываются в `TokenBuffer`, а не в список объектов `Token`.
+
+    В режиме `lazy` токенизация не выполняется в конструкторе: токены читаются по мере надобности через `TokenStream`.
+
+    В режиме `raw` сканер отмечает в таблице строк строки, с начала которых разбор можно начать заново, и
+    после правки части строк перетокенизирует только их окрестность (см. `update`).
+    """
+
+    def __init__(self, rfile, settings: Settings, lines: list, raw=False, lazy=False):
+        """
+        :param rfile: исходный код: сырой текст при `raw`, иначе экранированный repr текст (строка или список символов)
+        :param settings: настройки линтера
+        :param lines: строки файла в том же виде, что и `rfile`
+        :param raw: True, если передан сырой текст файла
+        :param lazy: True, если токены нужно получать потоком через `iter_settled`
+        """
+        self.raw = raw
+        self.lazy = lazy
+        self.source = rfile if isinstance(rfile, str) else ''.join(rfile)
+        if raw:
+            self._new_line = '\n'
+            self._tab = '\t'
+            self._indent_pattern = _INDENT
+        self.whitespace_runs = raw and settings.whitespace_runs.value
+        super().__init__(rfile, settings, lines)
+
+    def _tokenize(self):
+        """
+        Выполняет лексический анализ за один проход по строке исходного кода. В режиме `lazy` только готовит буфер.
+        """
+        self.tokens = TokenBuffer()
+        self._unchecked_line = 0
+        # Был ли '<' или '>' после последней ';': следующий '>' может поменять его тип
+        self._angle_pending = False
+        # Операторы после последней ';' в виде пар (индекс '<' или -1, может ли этот '<' открывать generic)
+        self._angle_stack = []
+        # Сколько токенов уже отдано потоком в режиме `lazy`: их тип больше менять нельзя
+        self.settled = 0
+        if self.raw:
+            self._mark_line_start()
+        if not self.lazy:
+            for _ in self.iter_settled():
+                pass
+
+    def iter_settled(self):
+        """
+        Генератор, который читает исходный код и по ходу дела выдаёт количество окончательных токенов.
+        Токен считается окончательным, когда его тип уже не может поменять проверка угловых скобок у следующего '>':
+        эта проверка идёт назад только до ';', поэтому ждать приходится лишь токены после первого нерешённого
+        '<' или '>' с последней ';'. Ожидание ограничено окном `settings.stream_window`.
+        В обычном режиме ничего не выдаёт до конца файла.
+        """
+        text = self.source
+        length = len(text)
+        dispatch = self._raw_dispatch if self.raw else self._dispatch
+        tokens = self.tokens
+        window = self.settings.stream_window.value
+        first_candidate = None
+        settled = 0
+        pos = 0
+        while pos < length:
+            count = len(tokens)
+            pos = dispatch.get(text[pos], Scanner._scan_other)(self, text, pos)
+            if not self.lazy:
+                continue
+
+            for index in range(count, len(tokens)):
+                value = tokens.value(index)
+                if value == ";":
+                    first_candidate = None
+                elif first_candidate is None and (value == "<" or value == ">") and \
+                        tokens.kind(index) == KindToken.operator:
+                    first_candidate = index
+            ready = len(tokens) if first_candidate is None else max(first_candidate, len(tokens) - window)
+            if ready > settled:
+                settled = self.settled = ready
+                yield settled
+        self.abs_index_char = pos
+        yield len(tokens)
+
+    def update(self, text: str, first_line: int, last_line: int, lines=None):
+        """
+        Перетокенизирует файл после правки, не разбирая его заново целиком. Разбор начинается с ближайшей строки
+        до правки, с которой его можно начать заново (не внутри комментария, строки или LINTER:OFF и без нерешённых
+        угловых скобок после последней ';'), и идёт, пока после правки не встретится такая же строка, которая была
+        безопасной и в старом разборе. Дальше старые токены переиспользуются со сдвигом номеров строк.
+        Работает только для сырого текста и не ленивого сканера.
+        :param text: новый текст файла
+        :param first_line: номер первой изменённой строки в новом тексте
+        :param last_line: номер последней изменённой строки в новом тексте (включительно)
+        :param lines: строки нового текста, если они уже посчитаны
+        """
+        if not self.raw or self.lazy:
+            raise ValueError("Incremental update needs a raw, non-lazy Scanner")
+        lines = text.split("\n") if lines is None else lines
+        delta = len(lines) - len(self.lines)
+        old_table = self.line_table
+        restart = max(1, min(first_line, len(old_table), len(lines)))
+        while not old_table.is_safe(restart):
+            restart -= 1
+
+        restart_token = old_table.first_tokens[restart - 1]
+        tail = self.tokens.split_off(restart_token)
+        old_end = (self.index_line, self.index_char)
+        old_lengths, old_long, old_comments = self.line_lengths, self.too_long_lines, self.lines_with_comments
+        self.line_lengths = old_lengths[:restart - 1]
+        self.too_long_lines = old_long[:bisect_left(old_long, (restart,))]
+        self.lines_with_comments = old_comments[:bisect_left(old_comments, restart)]
+        self.line_table = table = old_table.head(restart - 1)
+        self.lines = lines
+        self.suppressions = Suppressions(lines)
+        self.source = text
+        self.index_line, self.index_char = restart, 0
+        self._angle_pending = False
+        self._angle_stack = []
+        self._unchecked_line = 0
+        pos = self._line_offset = old_table.start_offsets[restart - 1]
+        self._begin_line()
+        self._mark_line_start()
+
+        dispatch = self._raw_dispatch
+        tokens = self.tokens
+        length = len(text)
+        while pos < length:
+            line = self.index_line
+            pos = dispatch.get(text[pos], Scanner._scan_other)(self, text, pos)
+            if (self.index_line == line or self.index_line <= last_line or not table.is_safe(self.index_line)
+                    or table.first_tokens[self.index_line - 1] != len(tokens)):
+                continue
+            old_line = self.index_line - delta
+            if old_line > len(old_table) or not old_table.is_safe(old_line):
+                continue
+            # С этой строки старый и новый разбор совпадают
+            old_first_token = old_table.first_tokens[old_line - 1]
+            token_shift = len(tokens) - old_first_token
+            tokens.extend_columns(tuple(column[old_first_token - restart_token:] for column in tail), delta)
+            self.line_lengths += old_lengths[old_line - 1:]
+            self.too_long_lines += [(index + delta, count)
+                                    for index, count in old_long[bisect_left(old_long, (old_line,)):]]
+            self.lines_with_comments += [index + delta for index in old_comments[bisect_left(old_comments, old_line):]]
+            offset_shift = table.start_offsets[self.index_line - 1] - old_table.start_offsets[old_line - 1]
+            table.truncate(self.index_line - 1)
+            table.extend(old_table, old_line, offset_shift, token_shift)
+            self.index_line, self.index_char = old_end[0] + delta, old_end[1]
+            break
+        self.abs_index_char = length
+
+    def _scan_other(self, text: str, pos: int) -> int:
+        """
+        Обрабатывает символы, которых нет в таблице разбора: буквы и цифры не из ASCII и прочие пробельные символы.
+        """
+        char = text[pos]
+        if char.isalpha():
+            return self._scan_identifier(text, pos)
+        if char.isdigit():
+            return self._scan_number(text, pos)
+        if self.raw and char.isspace():
+            return self._scan_space(text, pos)
+        raise UnexpectedChar(char, text[max(pos - 9, 0):pos + 11])
+
+    def _mark_line_start(self):
+        """
+        Запоминает, что с начала только что начатой строки разбор можно начать заново.
+        """
+        if not self._angle_pending and self.index_line <= len(self.line_table):
+            self.line_table.flags[self.index_line - 1] |= LINE_SAFE
+
+    def _add_token(self, value: str, kind=KindToken.none):
+        """
+        Добавляет токен, начинающийся в текущей позиции строки, и сдвигает позицию на его длину.
+        Тип токена обычно известен из таблицы разбора, тогда он не определяется заново.
+        """
+        self.tokens.append(self.index_char, self.index_line, value, kind)
+        self.index_char += len(value)
+
+    def _scan_identifier(self, text: str, pos: int) -> int:
+        match = _IDENTIFIER.match(text, pos)
+        value = match.group()
+        self._add_token(value, KindToken.keyword if value in keywords else KindToken.identifier)
+        return match.end()
+
+    def _scan_number(self, text: str, pos: int) -> int:
+        match = _NUMBER.match(text, pos)
+        self._add_token(match.group(), KindToken.identifier)
+        return match.end()
+
+    def _scan_space(self, text: str, pos: int) -> int:
+        if self.whitespace_runs and self._at_line_start():
+            return self._scan_blank_run(text, pos)
+        self._add_token(text[pos], KindToken.whiteSpace)
+        return pos + 1
+
+    def _at_line_start(self) -> bool:
+        """
+        :return: True, если перед текущей позицией нет токенов или последний токен - перевод строки
+        """
+        tokens = self.tokens
+        return len(tokens) == tokens.offset or tokens.value(len(tokens) - 1) == r'\n'
+
+    def _scan_blank_run(self, text: str, pos: int) -> int:
+        """
+        Читает отступ (табуляции и пробелы после перевода строки) одним токеном, например r'\t\t'. Отступ занимает
+        по одной позиции на символ, поэтому i-й символ такого токена стоит в start_index + i.
+        """
+        match = _BLANK_RUN.match(text, pos)
+        run = match.group()
+        self.tokens.append(self.index_char, self.index_line, run.replace('\t', r'\t'), KindToken.whiteSpace)
+        self.index_char += len(run)
+        return match.end()
+
+    def _scan_new_line(self, text: str, pos: int) -> int:
+        self.tokens.append(self.index_char, self.index_line, r'\n', KindToken.whiteSpace)
+        self._processing_new_line()
+        self._mark_line_start()
+        return pos + 1
+
+    def _scan_control_char(self, text: str, pos: int) -> int:
+        if text[pos] == '\t' and self.whitespace_runs and self._at_line_start():
+            return self._scan_blank_run(text, pos)
+        value = _RAW_CONTROL_CHARS[text[pos]]
+        self.tokens.append(self.index_char, self.index_line, value,
+                           KindToken.whiteSpace if value == r'\t' else KindToken.none)
+        self.index_char += 1
+        return pos + 1
+
+    def _scan_backslash(self, text: str, pos: int) -> int:
+        """
+        Обрабатывает экранированные последовательности, в которые repr превращает переводы строк и табуляции.
+        """
+        pair = text[pos:pos + 2]
+        if pair == r'\n':
+            self.tokens.append(self.index_char, self.index_line, pair, KindToken.whiteSpace)
+            self._processing_new_line()
+            return pos + 2
+        if pair == r'\t':
+            self._add_token(pair, KindToken.whiteSpace)
+            return pos + 2
+        if pair in backslash_character_literals:
+            self._add_token(pair)
+            return pos + 2
+        raise UnexpectedChar(text[pos], text[max(pos - 9, 0):pos + 11])
+
+    def _scan_slash(self, text: str, pos: int) -> int:
+        pair = text[pos:pos + 2]
+        if pair == "//":
+            return self._scan_line_comment(text, pos)
+        if pair == "/*":
+            return self._scan_block_comment(text, pos)
+        return self._scan_operator(text, pos)
+
+    def _scan_line_comment(self, text: str, pos: int) -> int:
+        """
+        Пропускает однострочный комментарий, заменяя его токеном перевода строки. Комментарий LINTER:OFF пропускает
+        всё до конца своего участка из `suppressions`, то есть до строки с LINTER:ON включительно.
+        """
+        self._mark_comment_line()
+        region_end = self.suppressions.region_end(self.index_line)
+        if region_end is not None:
+            if self.raw:
+                return self._skip_linter_off(text, pos, region_end)
+            pos += len(self.lines[self.index_line - 1][(self.index_char + 2):]) + 4
+            self._next_line()
+            while self.index_line < region_end:
+                pos += len(self.lines[self.index_line - 1]) + 2
+                self._next_line()
+            if self.index_line <= len(self.lines):
+                pos += len(self.lines[self.index_line - 1])
+            return pos
+
+        end = text.find(self._new_line, pos)
+        self.tokens.append(self.index_char, self.index_line, r'\n', KindToken.whiteSpace)
+        if self.raw:
+            end = len(text) if end == -1 else end
+            self.index_char += end - pos
+            self._processing_new_line()
+            self._mark_line_start()
+            return end + 1
+        self._next_line()
+        return len(text) + 1 if end == -1 else end + 2
+
+    def _skip_linter_off(self, text: str, pos: int, region_end: int) -> int:
+        """
+        Пропускает сырой текст от комментария LINTER:OFF до конца строки region_end с LINTER:ON.
+        :return: позиция перевода строки после LINTER:ON
+        """
+        end = text.find('\n', pos)
+        pos = len(text) if end == -1 else end + 1
+        self._skip_line()
+        while self.index_line < region_end:
+            pos += len(self.lines[self.index_line - 1]) + 1
+            self._skip_line()
+        if self.index_line <= len(self.lines):
+            pos += len(self.lines[self.index_line - 1])
+        # Строка с LINTER:ON тоже не проверяется на длину
+        self._unchecked_line = self.index_line
+        return pos
+
+    def _skip_line(self):
+        """
+        Заканчивает строку внутри участка LINTER:OFF: длина строки запоминается, но не проверяется.
+        """
+        self.line_lengths.append(self.line_table.lengths[self.index_line - 1])
+        self._next_line()
+
+    def _scan_block_comment(self, text: str, pos: int) -> int:
+        """
+        Пропускает многострочный комментарий, учитывая переводы строк внутри него.
+        """
+        self._mark_comment_line()
+        end = text.find("*/", pos + 1)
+        if end == -1:
+            end = len(text) - 1
+        self._pass_new_lines(text, pos, end, comment=True)
+        self.tokens.append(self.index_char, self.index_line, r'\n', KindToken.whiteSpace)
+        if self.raw:
+            self.index_char += 2
+        return end + 2
+
+    def _pass_new_lines(self, text: str, start: int, end: int, comment=False):
+        """
+        Учитывает переводы строк внутри уже прочитанного куска text[start:end] и ставит позицию в строке на его конец.
+        :param comment: True, если кусок является комментарием и его строки нужно отметить как строки с комментариями
+        """
+        column = self.index_char
+        new_line = text.find(self._new_line, start, end)
+        while new_line != -1:
+            self.index_char = column + new_line - start
+            self._processing_new_line()
+            if comment:
+                self._mark_comment_line()
+            # В экранированном тексте перевод строки занимает два символа, и старый Tokenizer считал второй из них
+            column = 0 if self.raw else 1
+            start = new_line + 1
+            new_line = text.find(self._new_line, start, end)
+        self.index_char = column + end - start
+
+    def _scan_punctuation(self, text: str, pos: int) -> int:
+        self._add_token(text[pos], KindToken.punctuation)
+        return pos + 1
+
+    def _scan_semicolon(self, text: str, pos: int) -> int:
+        self._angle_pending = False
+        self._angle_stack.clear()
+        self._add_token(';', KindToken.punctuation)
+        return pos + 1
+
+    def _scan_operator(self, text: str, pos: int) -> int:
+        pair = text[pos:pos + 2]
+        if len(pair) == 2 and pair in operators:
+            self._add_operator(pair)
+            return pos + 2
+        self._add_operator(text[pos])
+        return pos + 1
+
+    def _add_operator(self, value: str):
+        """
+        Добавляет оператор и кладёт его в стек `_angle_stack`. Для '<' сразу запоминается, может ли он открывать
+        generic: перед ним должен стоять идентификатор или ','.
+        """
+        if value == '<':
+            self._angle_stack.append((len(self.tokens), self._follows_type_name()))
+        else:
+            self._angle_stack.append(_NOT_ANGLE)
+        self._add_token(value, KindToken.operator)
+
+    def _follows_type_name(self):
+        """
+        :return: True, если последний не пробельный токен - идентификатор или ','
+        """
+        tokens = self.tokens
+        index = len(tokens) - 1
+        while index >= tokens.offset and tokens.kind(index) == KindToken.whiteSpace:
+            index -= 1
+        if index < tokens.offset:
+            return False
+        return tokens.value(index) == "," or tokens.kind(index) == KindToken.identifier
+
+    def _scan_less(self, text: str, pos: int) -> int:
+        self._angle_pending = True
+        if text[pos:pos + 2] == '<<':
+            self._add_operator('<<')
+            return pos + 2
+        return self._scan_operator(text, pos)
+
+    def _scan_greater(self, text: str, pos: int) -> int:
+        self._angle_pending = True
+        if self._close_angle_bracket():
+            self._add_token('>', KindToken.punctuation)
+            return pos + 1
+        if text[pos:pos + 2] == '>>':
+            self._add_operator('>>')
+            return pos + 2
+        return self._scan_operator(text, pos)
+
+    def _close_angle_bracket(self) -> bool:
+        """
+        То же, что `_check_punctuation_angle_bracket`, но без прохода назад. Проход назад от '>' пропускает всё,
+        кроме операторов, и останавливается на ';' или на первом операторе, а уже закрытые '<' и '>' становятся
+        пунктуацией. Значит, решение зависит только от последнего оператора после ';', то есть от вершины стека:
+        если это '<' после имени типа, то он становится пунктуацией и снимается со стека.
+        :return: True если '>' - пунктуация, и False если оператор
+        """
+        if not self._angle_stack:
+            return False
+        index, follows_type_name = self._angle_stack[-1]
+        if not follows_type_name:
+            return False
+        if index < self.settled:
+            # '<' уже отдан потоком как оператор, потому что generic конструкция длиннее окна
+            raise StreamWindowExceeded(index, self.settings.stream_window.value)
+        self._angle_stack.pop()
+        self.tokens[index].kind = KindToken.punctuation
+        return True
+
+    def _scan_string(self, text: str, pos: int) -> int:
+        """
+        Читает строковую или символьную константу вместе с префиксами $ и @. В сыром тексте конец константы ищется
+        по правилам C# (см. `literal_end`), а в экранированном - как в `Tokenizer`, до следующей такой же кавычки.
+        """
+        quote_index = pos
+        while quote_index < len(text) and text[quote_index] in '$@':
+            quote_index += 1
+        if quote_index == len(text) or text[quote_index] not in _QUOTES:
+            raise UnexpectedChar(text[pos], text[max(pos - 9, 0):pos + 11])
+        if self.raw:
+            end = literal_end(text, pos)
+            self.tokens.append(self.index_char, self.index_line, text[pos:end], KindToken.literal)
+            self._pass_new_lines(text, pos, end)
+            return end
+        end = text.find(text[quote_index], quote_index + 1)
+        end = len(text) if end == -1 else end + 1
+        self._add_token(text[pos:end], KindToken.literal)
+        return end
+
+    def _processing_new_line(self):
+        """
+        В сыром тексте длина строки уже посчитана по её тексту в таблице строк.
+        """
+        if not self.raw:
+            return super()._processing_new_line()
+        count_chars = self.line_table.lengths[self.index_line - 1]
+        self.line_lengths.append(count_chars)
+        if count_chars > self.settings.hard_wrap_at.value and self.index_line != self._unchecked_line:
+            self.too_long_lines.append((self.index_line, count_chars))
+        self._next_line()
+
+    def _line_width(self, line: str) -> int:
+        """
+        В сыром тексте длина строки считается по реальным символам, где табуляция занимает indent_size позиций.
+        """
+        if not self.raw:
+            return super()._line_width(line)
+        return len(line) + line.count("\t") * (self.settings.indent_size.value - 1)
+
+    _dispatch = {' ': _scan_space, '\\': _scan_backslash, '/': _scan_slash, '<': _scan_less, '>': _scan_greater,
+                 '_': _scan_identifier}
+    _dispatch.update(dict.fromkeys(_PUNCTUATION_CHARS, _scan_punctuation))
+    _dispatch[';'] = _scan_semicolon
+    _dispatch.update(dict.fromkeys(string.ascii_letters, _scan_identifier))
+    _dispatch.update(dict.fromkeys(string.digits, _scan_number))
+    _dispatch.update(dict.fromkeys(_OPERATOR_CHARS, _scan_operator))
+    _dispatch.update(dict.fromkeys(_QUOTES + '$@', _scan_string))
+
+    _raw_dispatch = dict(_dispatch, **{'\n': _scan_new_line})
+    _raw_dispatch.update(dict.fromkeys(_RAW_CONTROL_CHARS, _scan_control_char))
+    del _raw_dispatch['\\']
+
+
+# Окно меньше пары строк кода не покрывает даже просмотр назад внутри одной конструкции
+MIN_STREAM_WINDOW = 32
+
+
+class TokenStream:
+    """
+    Потоковый доступ к токенам ленивого `Scanner`. Индексируется как список токенов, но токены достаются из сканера
+    только при обращении к ним. Позади самого дальнего запрошенного токена хранится не больше двух окон
+    `settings.stream_window`, более старые токены выбрасываются, так что память не зависит от размера файла.
+    Обращение к уже выброшенному токену - ошибка `StreamWindowExceeded`, а не другой результат проверки.
+    """
+
+    def __init__(self, scanner: Scanner):
+        self.buffer = scanner.tokens
+        self.window = scanner.settings.stream_window.value
+        if self.window < MIN_STREAM_WINDOW:
+            raise ValueError(f"stream_window must be at least {MIN_STREAM_WINDOW}, got {self.window}")
+        self._settled_counts = scanner.iter_settled()
+        self._settled = 0
+        self.exhausted = False
+
+    def _pull(self, index: int):
+        """
+        Читает токены, пока токен с индексом index не станет окончательным или файл не закончится
+        """
+        while index >= self._settled and not self.exhausted:
+            try:
+                self._settled = next(self._settled_counts)
+            except StopIteration:
+                self.exhausted = True
+
+    def _release(self, index: int):
+        """
+        Выбрасывает токены, которые отстали от index больше чем на окно. Выбрасывает сразу целое окно, чтобы сдвиг
+        столбцов буфера случался редко.
+        """
+        if index - self.buffer.offset > 2 * self.window:
+            self.buffer.discard_before(index - self.window)
+
+    def _check_kept(self, index: int):
+        if index < self.buffer.offset:
+            raise StreamWindowExceeded(index, self.window)
+
+    def at(self, index: int):
+        if index < 0:
+            return None
+        self._check_kept(index)
+        self._pull(index)
+        self._release(index)
+        return self.buffer.at(index)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            # Индекс с конца потребовал бы дочитать весь файл, см. `last`
+            raise StreamWindowExceeded(index, self.window)
+        self._check_kept(index)
+        self._pull(index)
+        self._release(index)
+        return self.buffer[index]
+
+    def last(self):
+        """
+        Дочитывает файл до конца, выбрасывая прочитанное по ходу, как при обычном чтении
+        :return: последний токен файла
+        """
+        while not self.exhausted:
+            self._pull(self._settled)
+            self._release(self._settled)
+        return self.buffer[len(self.buffer) - 1]
+
+
+def read_escaped_source(path: str):
+    """
+    Читает файл и готовит его так же, как это делает CSFile: экранированный текст и экранированные строки.
+    :param path: путь до файла
+    :return: пара (текст, строки)
+    """
+    with open(path, mode='r', encoding='utf8') as f:
+        data = f.read()
+    return repr(data)[1:-1], [repr(line)[1:-1] for line in data.split("\n")]
+
+
+def _unescape_line(line: str) -> str:
+    """
+    :param line: repr строки файла
+    :return: сама строка
+    """
+    return line.encode("latin-1", "backslashreplace").decode("unicode_escape")
+
+
+def _unescape_quotes(text: str) -> str:
+    """
+    Убирает экранирование одинарной кавычки, которое repr добавляет, когда в файле есть оба вида кавычек:
+    на таком тексте `Tokenizer` неверно разбирает символьные литералы
+    """
+    return re.sub(r"\\.", lambda match: "'" if match.group(0) == "\\'" else match.group(0), text)
+
+
+def raw_line_width(line: str, settings: Settings) -> int:
+    """
+    Длина строки так, как её считает `Scanner` на сыром тексте: по самой строке, а не по её repr,
+    с табуляцией в indent_size позиций и без добавки за перевод строки
+    :param line: repr строки файла
+    """
+    text = _unescape_line(line)
+    return len(text) + text.count("\t") * (settings.indent_size.value - 1)
+
+
+class _RawWidthTokenizer(Tokenizer):
+    """
+    `Tokenizer`, который считает длину строки как `Scanner` на сыром тексте, см. `raw_line_width`
+    """
+
+    def _processing_new_line(self):
+        count_chars = raw_line_width(self.lines[self.index_line - 1], self.settings)
+        self.line_lengths.append(count_chars)
+        if count_chars > self.settings.hard_wrap_at.value:
+            self.too_long_lines.append((self.index_line, count_chars))
+        self._next_line(count_chars)
+
+
+def compare_with_tokenizer(path: str, settings: Settings, raw=False) -> list:
+    """
+    Дифференциальная проверка: токенизирует файл старым `Tokenizer` и `Scanner` и сравнивает результаты.
+    В режиме raw `Scanner` читает сам текст файла, как при флаге raw_text: индексы токенов `Tokenizer` переводятся
+    из repr строки в индексы в самой строке, а длины строк `Tokenizer` считает по `raw_line_width`
+    :param path: путь до файла
+    :param settings: настройки
+    :param raw: True, чтобы проверить `Scanner` на сыром тексте
+    :return: список описаний расхождений, пустой если результаты совпали
+    """
+    text, lines = read_escaped_source(path)
+    if raw:
+        text, lines = _unescape_quotes(text), [_unescape_quotes(line) for line in lines]
+        expected = _RawWidthTokenizer(CustomList(text), settings, lines)
+        with open(path, mode='r', encoding='utf8') as f:
+            data = f.read()
+        actual = Scanner(data, settings, data.split("\n"), raw=True)
+    else:
+        expected = Tokenizer(CustomList(text), settings, lines)
+        actual = Scanner(text, settings, lines)
+    differences = []
+    for index in range(max(len(expected.tokens), len(actual.tokens))):
+        old, new = expected.tokens.at(index), actual.tokens.at(index)
+        old_data = None if old is None else (old.value, old.kind, old.line_index, old.start_index)
+        new_data = None if new is None else (new.value, new.kind, new.line_index, new.start_index)
+        if raw and old is not None:
+            start = len(_unescape_line(lines[old.line_index - 1][:old.start_index]))
+            if old.value == r'\n':
+                # Позиция токена, которым заменён комментарий, у Tokenizer сдвинута после переводов строк в нём
+                old_data = old_data[:3]
+                new_data = new_data if new is None else new_data[:3]
+            else:
+                # Пробельные токены оба сканера пишут экранированными, остальные Scanner берёт из самого текста
+                value = old.value if old.kind == KindToken.whiteSpace else _unescape_line(old.value)
+                old_data = (value,) + old_data[1:3] + (start,)
+        if old_data != new_data:
+            differences.append(f"token {index}: {old_data} != {new_data}")
+            break
+    # Таблица строк хранит смещения в тексте, которые у сырого текста другие, а line_lengths у Tokenizer
+    # пропускает строки участков LINTER:OFF, поэтому в режиме raw длины проверяются через too_long_lines
+    names = ["lines_with_comments", "too_long_lines"] if raw else \
+        ["lines_with_comments", "too_long_lines", "line_table"]
+    for name in names:
+        if getattr(expected, name) != getattr(actual, name):
+            differences.append(f"{name}: {getattr(expected, name)} != {getattr(actual, name)}")
+    return differences
+
+
+def iter_source_files(directory: str):
+    """
+    Перебирает все .cs файлы в папке и её подпапках
+    """
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if filename.endswith(".cs"):
+                yield os.path.join(root, filename)
+
+
+if __name__ == "__main__":
+    # Дифференциальный режим: python Scripts/Scanner.py [--raw] [папка или файлы...]
+    arguments = sys.argv[1:]
+    raw_mode = "--raw" in arguments
+    arguments = [argument for argument in arguments if argument != "--raw"]
+    paths = arguments or [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "TestFiles")]
+    failed = 0
+    for argument in paths:
+        for file_path in iter_source_files(argument) if os.path.isdir(argument) else [argument]:
+            result = compare_with_tokenizer(file_path, Settings(), raw=raw_mode)
+            print(("OK   " if not result else "DIFF ") + file_path)
+            for line in result:
+                print("    " + line)
+            failed += bool(result)
+    sys.exit(1 if failed else 0)
@@ -10,6 +10,32 @@ class Settings:
         self.insert_final_newline = Flag(True, types.FR)
         self.hard_wrap_at = Flag(120, types.FR)
 
+        # ENGINE
+        # table -- табличный Scanner, legacy -- посимвольный Tokenizer
+        self.tokenizer_engine = Flag("table", types.OR)
+        # True -- table движок читает сырой текст файла, а не его repr. Длина строки в этом режиме считается по реальным
+        # символам, табуляция -- indent_size позиций, поэтому hard_wrap_at срабатывает не так, как у legacy
+        self.raw_text = Flag(False, types.OR)
+        # True -- table движок отдаёт токены потоком по мере проверки, stream_window -- сколько токенов хранить позади.
+        # Окно должно покрывать самый длинный просмотр вперёд/назад, обычно это одна конструкция с generic типами.
+        # Окно меньше 32 не принимается, а выход проверки за окно - ошибка StreamWindowExceeded
+        self.stream_tokens = Flag(False, types.OR)
+        self.stream_window = Flag(4096, types.OR)
+        # True -- сырой table движок отдаёт отступ в начале строки одним токеном вида r'\t\t' вместо токена на символ
+        self.whitespace_runs = Flag(False, types.OR)
+
+        # LIMITS
+        # Сколько несовпадений выводить для одного файла всего и по одному правилу, 0 -- без ограничения.
+        # Когда общий предел превышен, проверка файла по графам останавливается, остальные несовпадения только считаются
+        self.max_mismatches = Flag(0, types.OR)
+        self.max_mismatches_per_rule = Flag(0, types.OR)
+
+        # RULES
+        # Какие правила проверять: имена правил, групп или категорий (CR, FR, NR) через запятую, см. Rules.rules.
+        # Выключенные правила не проверяются вовсе, а не отбрасываются после проверки
+        self.enabled_rules = Flag("all", types.OR)
+        self.disabled_rules = Flag("none", types.OR)
+
     def read_flags_from_file(self, file):
         with open(file, 'r') as f:
             for line in f:
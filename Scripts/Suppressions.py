@@ -0,0 +1,214 @@
+import re
+from bisect import bisect_right
+from functools import cache
+
+from Rules import internal_rule_names, rule_groups, rules
+
+# Комментарий LINTER:OFF или LINTER:ON и слова после него
+_DIRECTIVE = re.compile(r'LINTER:(OFF|ON)')
+_RULES = re.compile(r'[\w \t,]*')
+_RULE_SEPARATOR = re.compile(r'[\s,]+')
+# Начало комментария, строковой или символьной константы
+_LEXEME_START = re.compile(r'//|/\*|"|\'')
+# Экранированный символ в repr строке: \\ - обратная косая черта, \' - кавычка, остальные на разбор не влияют
+_ESCAPED = re.compile(r'\\(.)')
+
+# Правила и группы правил, которые можно выключить по отдельности, см. `Rules`
+rule_names = frozenset(rules) | frozenset(rule_groups)
+
+
+@cache
+def rule_name(called_from: str) -> str:
+    """
+    :param called_from: имя проверки, создавшей несовпадение
+    :return: имя правила, по которому его можно выключить
+    """
+    name = called_from[len("_check_"):] if called_from.startswith("_check_") else called_from.strip("_")
+    return internal_rule_names.get(name, name)
+
+
+def _parse_rules(words: str):
+    """
+    :return: множество правил из списка после LINTER:OFF/ON или None, если список пуст или в нём есть не правило
+    """
+    names = frozenset(word for word in _RULE_SEPARATOR.split(words) if word)
+    if not names or not names <= rule_names:
+        return None
+    return frozenset(rule for name in names for rule in rule_groups.get(name, (name,)))
+
+
+def _unescape(line: str) -> str:
+    """
+    Переводит repr строку в строку той же структуры для `_line_comments`: обратная косая черта и кавычка
+    восстанавливаются, остальные экранированные символы заменяются пробелом
+    """
+    return _ESCAPED.sub(lambda match: match.group(1) if match.group(1) in "\\'" else " ", line)
+
+
+def _skip_quoted(line: str, pos: int, quote: str) -> int:
+    """
+    :param pos: индекс символа после открывающей кавычки обычной строки или символьной константы
+    :return: индекс после закрывающей кавычки или длина строки, если константа не закрыта
+    """
+    while pos < len(line):
+        if line[pos] == "\\":
+            pos += 2
+        elif line[pos] == quote:
+            return pos + 1
+        else:
+            pos += 1
+    return len(line)
+
+
+def _line_comments(lines: list) -> dict:
+    """
+    Находит комментарии // с учётом строковых констант (обычных, verbatim и raw) и комментариев /* */,
+    которые могут занимать несколько строк
+    :return: словарь номер строки (с 1) -> индекс начала комментария // в строке
+    """
+    result = {}
+    # None - код, "block" - внутри /* */, "verbatim" - внутри @"...", число - внутри raw строки из стольких кавычек
+    state = None
+    for index, line in enumerate(lines):
+        pos = 0
+        while pos <= len(line):
+            if state == "block":
+                end = line.find("*/", pos)
+                if end < 0:
+                    break
+                pos, state = end + 2, None
+            elif state == "verbatim":
+                end = line.find('"', pos)
+                if end < 0:
+                    break
+                if line.startswith('""', end):
+                    pos = end + 2
+                else:
+                    pos, state = end + 1, None
+            elif state is not None:
+                end = line.find('"' * state, pos)
+                if end < 0:
+                    break
+                pos, state = end + state, None
+            else:
+                match = _LEXEME_START.search(line, pos)
+                if match is None:
+                    break
+                lexeme, start = match.group(), match.start()
+                if lexeme == "//":
+                    result[index + 1] = start
+                    break
+                if lexeme == "/*":
+                    pos, state = match.end(), "block"
+                elif lexeme == "'":
+                    pos = _skip_quoted(line, match.end(), "'")
+                elif "@" in line[max(0, start - 2):start]:
+                    pos, state = match.end(), "verbatim"
+                else:
+                    rest = line[start:]
+                    quotes = len(rest) - len(rest.lstrip('"'))
+                    if quotes >= 3:
+                        pos, state = start + quotes, quotes
+                    elif quotes == 2:
+                        pos = start + 2
+                    else:
+                        pos = _skip_quoted(line, match.end(), '"')
+    return result
+
+
+def _merge(intervals: list) -> tuple:
+    """
+    Объединяет пересекающиеся отрезки строк
+    :return: пара списков (начала, концы) непересекающихся отрезков по возрастанию
+    """
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class Suppressions:
+    """
+    Индекс участков файла, выключенных комментариями LINTER:OFF / LINTER:ON. Строится одним проходом по строкам
+    до токенизации.
+    `// LINTER:OFF` выключает все проверки до строки с LINTER:ON включительно: токенизатор такие строки не разбирает.
+    `// LINTER:OFF offset, line` выключает только перечисленные правила: строки разбираются, а несовпадения этих
+    правил отбрасываются. Такой участок заканчивается на `// LINTER:ON` или `// LINTER:ON offset`.
+    Участок без LINTER:ON продолжается до конца файла. Строки нумеруются с 1.
+    """
+
+    def __init__(self, lines: list, escaped=False):
+        """
+        :param lines: строки файла
+        :param escaped: True, если строки - repr строк файла, как у посимвольного `Tokenizer`
+        """
+        # Для каждой строки с LINTER:OFF без правил - строка, на которой заканчивается её участок
+        self.region_ends = {}
+        # Непересекающиеся участки для каждого правила, None - для всех правил сразу
+        self._starts = {}
+        self._ends = {}
+
+        if not any("LINTER:" in line for line in lines):
+            return
+        if escaped:
+            lines = [_unescape(line) if "\\" in line else line for line in lines]
+        # Директивы учитываются только в комментариях //, а не в строковых константах и комментариях /* */
+        comments = _line_comments(lines)
+        directives = []
+        for line_number, comment_start in comments.items():
+            line = lines[line_number - 1]
+            if "LINTER:" in line:
+                directives += [(line_number, match.group(1), _parse_rules(_RULES.match(line, match.end()).group()))
+                               for match in _DIRECTIVE.finditer(line, comment_start)]
+        if not directives:
+            return
+
+        # Участок без правил заканчивает только LINTER:ON без правил
+        on_lines = sorted({line for line, kind, rules in directives if kind == "ON" and rules is None})
+        intervals = {None: []}
+        opened = {}
+        for line, kind, rules in directives:
+            if kind == "OFF" and rules is None:
+                index = bisect_right(on_lines, line)
+                end = on_lines[index] if index < len(on_lines) else len(lines)
+                self.region_ends[line] = end
+                intervals[None].append((line, end))
+            elif kind == "OFF":
+                for rule in rules:
+                    opened.setdefault(rule, line)
+            else:
+                for rule in list(opened) if rules is None else rules & opened.keys():
+                    intervals.setdefault(rule, []).append((opened.pop(rule), line))
+        for rule, start in opened.items():
+            intervals.setdefault(rule, []).append((start, len(lines)))
+        for rule, rule_intervals in intervals.items():
+            self._starts[rule], self._ends[rule] = _merge(rule_intervals)
+
+    def region_end(self, line: int):
+        """
+        :return: последняя строка участка, который выключает все проверки и начинается на строке line,
+         или None, если такого участка нет
+        """
+        return self.region_ends.get(line)
+
+    def _contains(self, rule, line: int) -> bool:
+        starts = self._starts.get(rule)
+        if not starts:
+            return False
+        index = bisect_right(starts, line) - 1
+        return index >= 0 and line <= self._ends[rule][index]
+
+    def is_suppressed(self, line: int, rule=None) -> bool:
+        """
+        :param line: номер строки
+        :param rule: имя правила или None, если нужно узнать, выключены ли в строке все правила
+        :return: True, если несовпадения правила rule в строке line нужно отбросить
+        """
+        return self._contains(None, line) or rule is not None and self._contains(rule, line)
+
+    def __bool__(self):
+        return bool(self._starts)
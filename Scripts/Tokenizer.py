@@ -1,4 +1,7 @@
+import re
+
 from Settings import Settings
+from Suppressions import Suppressions
 from exceptions import UnexpectedChar
 from Utils import *
 
@@ -6,7 +9,14 @@ from Utils import *
 class Tokenizer:
     """
     Класс для лексического анализа (токенеризации) исходного кода.
+    Кроме токенов заполняет таблицу строк `line_table` (см. `LineTable`).
     """
+    # Перевод строки, табуляция и отступ в экранированном тексте
+    _new_line = r'\n'
+    _tab = r'\t'
+    _indent_pattern = re.compile(r'(?:\\t| )*')
+    # True, если токенизируется сырой текст файла, а не его repr, см. `Scanner`
+    raw = False
 
     def __init__(self, rfile: CustomList, settings: Settings, lines: list):
         """
@@ -24,6 +34,10 @@ class Tokenizer:
         self.lines_with_comments = []
         self.too_long_lines = []
         self.line_lengths = []
+        self.suppressions = Suppressions(lines, escaped=not self.raw)
+        self.line_table = LineTable()
+        self._line_offset = 0
+        self._begin_line()
         self._tokenize()
 
     def __str__(self):
@@ -193,30 +207,29 @@ class Tokenizer:
         :return: True, если удалось прочесть и False в противном случае
         """
         if self.next_char and self.current_char + self.next_char == "//":
-            self.lines_with_comments.append(self.index_line)
-            if "LINTER:OFF" in self.lines[self.index_line-1]:
+            self._mark_comment_line()
+            region_end = self.suppressions.region_end(self.index_line)
+            if region_end is not None:
                 self.abs_index_char += len(self.lines[self.index_line-1][(self.index_char+2):]) + 3
-                self.index_char = 0
-                self.index_line += 1
-                while "LINTER:ON" not in self.lines[self.index_line-1]:
+                self._next_line()
+                while self.index_line < region_end:
                     self.abs_index_char += len(self.lines[self.index_line-1]) + 2
-                    self.index_line += 1
+                    self._next_line()
                 self.abs_index_char += len(self.lines[self.index_line-1])
             else:
                 while self.next_char is not None and self.current_char + self.next_char != r"\n":
                     self._update_data()
                 self.tokens.append(Token(self.index_char, self.index_line, r'\n'))
                 self.abs_index_char += 1
-                self.index_line += 1
-                self.index_char = 0
+                self._next_line()
             return True
 
         if self.next_char and self.current_char + self.next_char == "/*":
-            self.lines_with_comments.append(self.index_line)
+            self._mark_comment_line()
             while self.next_char is not None and self.current_char + self.next_char != r"*/":
                 if self.current_char + self.next_char == r"\n":
                     self._processing_new_line()
-                    self.lines_with_comments.append(self.index_line)
+                    self._mark_comment_line()
                 self._update_data()
                 self.index_char += 1
             self.tokens.append(Token(self.index_char, self.index_line, r'\n'))
@@ -231,15 +244,20 @@ class Tokenizer:
         :param quote: Тип кавычек
         :return: True, если удалось прочесть и False в противном случае
         """
-        literal = quote
-        while self.abs_index_char < len(self.rfile):
-            self.current_char = self.rfile[self.abs_index_char]
-            if self.current_char == quote:
-                self.abs_index_char += 1
-                return literal + quote
-            literal += self.current_char
-            self.abs_index_char += 1
-        return literal
+        start = self.abs_index_char
+        try:
+            end = self.rfile.index(quote, start)
+        except ValueError:
+            end = len(self.rfile)
+        literal = quote + ''.join(self.rfile[start:end])
+        if end == len(self.rfile):
+            self.abs_index_char = end
+            if end > start:
+                self.current_char = self.rfile[end - 1]
+            return literal
+        self.current_char = quote
+        self.abs_index_char = end + 1
+        return literal + quote
 
     def _get_integer_literal(self) -> str:
         """
@@ -285,11 +303,13 @@ class Tokenizer:
         :return: True если пунктуация, и False если оператор
         """
         index_token = start_index_token
-        token = self.tokens[start_index_token]  # type: Token
+        token = self.tokens.at(start_index_token)  # type: Token
         while token is not None and token.value != ";":
             if token.value == "<" and token.kind != KindToken.punctuation:
                 index_first_not_whitespace_token_back = self._get_index_first_not_whitespace_token_back(index_token - 1)
-                back_token = self.tokens[index_first_not_whitespace_token_back]
+                back_token = self.tokens.at(index_first_not_whitespace_token_back)
+                if back_token is None:
+                    return False
                 if back_token.value == ",":
                     token.kind = KindToken.punctuation
                     return True
@@ -320,12 +340,12 @@ class Tokenizer:
         :return: индекс токена или None, если не нашел
         """
         index = start_index_token
-        token = self.tokens[start_index_token]
-        while index >= 0:
+        token = self.tokens.at(start_index_token)
+        while token is not None:
             if token.kind != KindToken.whiteSpace:
                 return index
             index -= 1
-            token = self.tokens[index]
+            token = self.tokens.at(index)
         return -1
 
     def _get_next_not_space_token_value(self, start_index: int) -> Token:
@@ -359,8 +379,44 @@ class Tokenizer:
         self.line_lengths.append(count_chars)
         if count_chars > self.settings.hard_wrap_at.value:
             self.too_long_lines.append((self.index_line, count_chars))
+        self._next_line(count_chars)
+
+    def _line_width(self, line: str) -> int:
+        """
+        :return: длина строки line, посчитанная так же, как в `_processing_new_line`
+        """
+        return len(line) + 1 + line.count("\t") * (self.settings.indent_size.value - 2)
+
+    def _begin_line(self):
+        """
+        Добавляет в таблицу строк только что начатую строку index_line.
+        """
+        if self.index_line > len(self.lines):
+            return
+        line = self.lines[self.index_line - 1]
+        indent_length = self._indent_pattern.match(line).end()
+        tabs = line.count(self._tab, 0, indent_length)
+        self.line_table.append(self._line_offset, len(self.tokens), tabs, indent_length - tabs * len(self._tab),
+                               self._line_width(line), indent_length == len(line))
+        self._line_offset += len(line) + len(self._new_line)
+
+    def _next_line(self, length=None):
+        """
+        Переходит на следующую строку.
+        :param length: длина законченной строки, если она отличается от посчитанной по её тексту
+        """
+        if length is not None and self.index_line <= len(self.line_table):
+            self.line_table.lengths[self.index_line - 1] = length
         self.index_line += 1
         self.index_char = 0
+        self._begin_line()
+
+    def _mark_comment_line(self):
+        """
+        Отмечает текущую строку как строку с комментарием
+        """
+        self.lines_with_comments.append(self.index_line)
+        self.line_table.add_flag(self.index_line, LINE_COMMENT)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,25 @@
 import enum
+import re
+from array import array
 
-keywords = ['abstract', 'as', 'base', 'bool', 'break', 'byte', 'case', 'catch', 'char', 'checked', 'class', 'const',
-            'continue', 'decimal', 'default', 'delegate', 'do', 'double', 'else', 'enum', 'event', 'explicit', 'extern',
-            'false', 'finally', 'fixed', 'float', 'for.cs', 'foreach', 'goto', 'if', 'implicit', 'in', 'int',
-            'interface',
-            'internal', 'is', 'lock', 'long', 'namespace', 'new', 'null', 'object', 'operator', 'out', 'override',
-            'params', 'private', 'protected', 'public', 'readonly', 'ref', 'return', 'sbyte', 'sealed', 'short',
-            'sizeof', 'stackalloc', 'static', 'string', 'struct', 'switch', 'this', 'throw', 'true', 'try', 'typeof',
-            'uint', 'ulong', 'unchecked', 'unsafe', 'ushort', 'using', 'virtual', 'void', 'volatile', 'while']
+keywords = frozenset([
+    'abstract', 'as', 'base', 'bool', 'break', 'byte', 'case', 'catch', 'char', 'checked', 'class', 'const',
+    'continue', 'decimal', 'default', 'delegate', 'do', 'double', 'else', 'enum', 'event', 'explicit', 'extern',
+    'false', 'finally', 'fixed', 'float', 'for', 'foreach', 'goto', 'if', 'implicit', 'in', 'int', 'interface',
+    'internal', 'is', 'lock', 'long', 'namespace', 'new', 'null', 'object', 'operator', 'out', 'override',
+    'params', 'private', 'protected', 'public', 'readonly', 'ref', 'return', 'sbyte', 'sealed', 'short',
+    'sizeof', 'stackalloc', 'static', 'string', 'struct', 'switch', 'this', 'throw', 'true', 'try', 'typeof',
+    'uint', 'ulong', 'unchecked', 'unsafe', 'ushort', 'using', 'virtual', 'void', 'volatile', 'while'])
 
-punctuations = [';', ':', ',', '.', '(', ')', '[', ']', '{', '}', '?', '<', '>', '#']
+punctuations = frozenset([';', ':', ',', '.', '(', ')', '[', ']', '{', '}', '?', '<', '>', '#'])
 
-operators = ['+', '-', '*', '/', '%', '=', '>>', '<<', '&', '&&', '|', '||', '!', '^', '>', '>=', '<', '<=', '==', '!=',
-             '~', '+=', '-=', '/=', '*=', '%=', '++', '--']
+operators = frozenset(['+', '-', '*', '/', '%', '=', '>>', '<<', '&', '&&', '|', '||', '!', '^', '>', '>=', '<', '<=',
+                       '==', '!=', '~', '+=', '-=', '/=', '*=', '%=', '++', '--'])
 
-backslash_character_literals = [r'\n', r'\r', r'\f', r'\t', r'\a', r'\b', r'\o', r'\v', r'\\', r"\'", r'\"']
+# Любой оператор состоит только из этих символов, поэтому поиск оператора внутри значения сводится к поиску символа
+operator_chars = frozenset(''.join(operators))
+
+backslash_character_literals = frozenset([r'\n', r'\r', r'\f', r'\t', r'\a', r'\b', r'\o', r'\v', r'\\', r"\'", r'\"'])
 
 number_postfixes = ['f', 'l', 'd']
 
@@ -48,6 +53,84 @@ class KindToken(enum.Enum):
     none = None
 
 
+# Типы уже встречавшихся значений. Каждое значение классифицируется один раз за время работы процесса
+_kinds_by_value = {}
+_max_cached_kinds = 1 << 16
+
+
+def define_kind_token(value: str) -> KindToken:
+    """
+    Определяет тип токена на основе его значения.
+    :param value: значение токена
+    :return: тип токена
+    """
+    kind = _kinds_by_value.get(value)
+    if kind is None:
+        kind = _classify_value(value)
+        if len(_kinds_by_value) < _max_cached_kinds:
+            _kinds_by_value[value] = kind
+    return kind
+
+
+def _classify_value(value: str) -> KindToken:
+    if value in keywords:
+        return KindToken.keyword
+    if value in operators:
+        return KindToken.operator
+    if value in punctuations:
+        return KindToken.punctuation
+    if '\'' in value or '"' in value or not operator_chars.isdisjoint(value):
+        return KindToken.literal
+    if value.isspace() or value == r"\n" or value == r"\t":
+        return KindToken.whiteSpace
+    else:
+        return KindToken.identifier
+
+
+_BLANK_PART = re.compile(r'\\t| ')
+_blank_values_cache = {}
+
+
+def blank_values(value: str) -> tuple:
+    """
+    Разбивает значение токена отступа на значения отдельных символов.
+    :param value: значение токена, например r'\t\t ' для токена-отступа
+    :return: кортеж из r'\t' и ' ', или пустой кортеж, если токен не состоит из табуляций и пробелов
+    """
+    elements = _blank_values_cache.get(value)
+    if elements is None:
+        parts = _BLANK_PART.findall(value)
+        elements = tuple(parts) if parts and len(value) == sum(map(len, parts)) else ()
+        if len(_blank_values_cache) < _max_cached_kinds:
+            _blank_values_cache[value] = elements
+    return elements
+
+
+def is_blank(value: str) -> bool:
+    """
+    :return: True, если токен состоит только из табуляций и пробелов
+    """
+    return value == " " or value == r"\t" or bool(blank_values(value))
+
+
+def blank_element(token, index: int):
+    """
+    Возвращает index-й символ токена-отступа из нескольких символов (см. флаг whitespace_runs) отдельным токеном,
+    чтобы несовпадения указывали на те же символы, что и без него. Остальные токены возвращает как есть.
+    """
+    values = blank_values(token.value)
+    if len(values) < 2:
+        return token
+    return Token(token.start_index + index, token.line_index, values[index], KindToken.whiteSpace)
+
+
+def blank_elements(token) -> list:
+    """
+    Разбивает токен-отступ на токены отдельных символов, см. `blank_element`
+    """
+    return [blank_element(token, i) for i in range(max(1, len(blank_values(token.value))))]
+
+
 class Token:
     """
     Класс для представления отдельных лексем (токенов) в исходном коде.
@@ -72,18 +155,7 @@ class Token:
         """
         :return: Определяет тип токена на основе его значения.
         """
-        if self.value in keywords:
-            return KindToken.keyword
-        if self.value in operators:
-            return KindToken.operator
-        if self.value in punctuations:
-            return KindToken.punctuation
-        if '\'' in self.value or '"' in self.value or any(oper in self.value for oper in operators):
-            return KindToken.literal
-        if self.value.isspace() or self.value == r"\n" or self.value == r"\t":
-            return KindToken.whiteSpace
-        else:
-            return KindToken.identifier
+        return define_kind_token(self.value)
 
     def __str__(self):
         return self._str_v2()
@@ -96,3 +168,342 @@ class Token:
 
     def _str_v2(self):
         return f"'{self.value}'"
+
+
+# Коды типов токенов для хранения в TokenBuffer
+_kind_by_code = tuple(kind for kind in KindToken if kind is not KindToken.none)
+_code_by_kind = {kind: code for code, kind in enumerate(_kind_by_code)}
+
+
+class TokenView:
+    """
+    Лёгкое представление токена из `TokenBuffer`. Имеет те же поля, что и `Token`, но не хранит данных,
+    а читает их из столбцов буфера.
+    """
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer, index: int):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def value(self) -> str:
+        buffer = self.buffer
+        return buffer.values[buffer.value_ids[self.index - buffer.offset]]
+
+    @property
+    def kind(self) -> KindToken:
+        return _kind_by_code[self.buffer.kinds[self.index - self.buffer.offset]]
+
+    @kind.setter
+    def kind(self, kind: KindToken):
+        self.buffer.kinds[self.index - self.buffer.offset] = _code_by_kind[kind]
+
+    @property
+    def start_index(self) -> int:
+        return self.buffer.start_indexes[self.index - self.buffer.offset]
+
+    @property
+    def line_index(self) -> int:
+        return self.buffer.line_indexes[self.index - self.buffer.offset]
+
+    def __str__(self):
+        return f"'{self.value}'"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class TokenBuffer:
+    """
+    Компактное хранилище токенов. Вместо объекта `Token` на каждую лексему хранит параллельные столбцы array:
+    индекс начала, индекс строки, код типа и номер значения в таблице уникальных значений.
+    Индексируется так же, как список токенов, и возвращает `TokenView`.
+    Начало буфера можно выбросить через `discard_before`, индексы оставшихся токенов при этом не меняются.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.start_indexes = array('i')
+        self.line_indexes = array('i')
+        self.kinds = array('b')
+        self.value_ids = array('i')
+        self.values = []
+        self._ids_by_value = {}
+
+    def append(self, start_index: int, line_index: int, value: str, kind=KindToken.none):
+        """
+        Добавляет токен в конец буфера. Если `kind` не задан, то тип определяется по значению.
+        """
+        value_id = self._ids_by_value.get(value)
+        if value_id is None:
+            value_id = self._ids_by_value[value] = len(self.values)
+            self.values.append(value)
+        if kind is KindToken.none:
+            kind = define_kind_token(value)
+        self.start_indexes.append(start_index)
+        self.line_indexes.append(line_index)
+        self.kinds.append(_code_by_kind[kind])
+        self.value_ids.append(value_id)
+
+    def value(self, index: int) -> str:
+        return self.values[self.value_ids[index - self.offset]]
+
+    def kind(self, index: int) -> KindToken:
+        return _kind_by_code[self.kinds[index - self.offset]]
+
+    def discard_before(self, index: int):
+        """
+        Выбрасывает токены с индексами меньше index
+        """
+        count = min(index, len(self)) - self.offset
+        if count <= 0:
+            return
+        for column in (self.start_indexes, self.line_indexes, self.kinds, self.value_ids):
+            del column[:count]
+        self.offset += count
+
+    def split_off(self, index: int) -> tuple:
+        """
+        Отрезает токены с индексами от index и до конца.
+        :return: столбцы отрезанных токенов (индексы начала, индексы строк, коды типов, номера значений)
+        """
+        cut = index - self.offset
+        tail = tuple(column[cut:] for column in (self.start_indexes, self.line_indexes, self.kinds, self.value_ids))
+        for column in (self.start_indexes, self.line_indexes, self.kinds, self.value_ids):
+            del column[cut:]
+        return tail
+
+    def extend_columns(self, columns: tuple, line_shift=0):
+        """
+        Дописывает в конец столбцы, ранее отрезанные `split_off` у этого же буфера.
+        :param line_shift: на сколько сдвинуть индексы строк дописанных токенов
+        """
+        start_indexes, line_indexes, kinds, value_ids = columns
+        if line_shift:
+            line_indexes = array('i', map(line_shift.__add__, line_indexes))
+        self.start_indexes.extend(start_indexes)
+        self.line_indexes.extend(line_indexes)
+        self.kinds.extend(kinds)
+        self.value_ids.extend(value_ids)
+
+    def at(self, index: int):
+        if self.offset <= index < self.offset + len(self.kinds):
+            return TokenView(self, index)
+        else:
+            return None
+
+    def __len__(self):
+        return self.offset + len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TokenView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not self.offset <= index < len(self):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(self.offset, len(self)):
+            yield TokenView(self, index)
+
+
+class SignificantTokens:
+    """
+    Индексы ближайших не пробельных токенов для каждого токена готового списка токенов. Строится одним проходом
+    после токенизации: `next[i]` - первый не пробельный токен с индексом >= i, `previous[i]` - последний с индексом
+    <= i, -1 - если такого токена нет.
+    """
+    __slots__ = ("next", "previous")
+
+    def __init__(self, tokens):
+        """
+        :param tokens: `TokenBuffer` или список токенов
+        """
+        if isinstance(tokens, TokenBuffer):
+            blank_code = _code_by_kind[KindToken.whiteSpace]
+            blanks = [code == blank_code for code in tokens.kinds]
+        else:
+            blanks = [token.kind == KindToken.whiteSpace for token in tokens]
+        self.next = array('i', [-1]) * len(blanks)
+        self.previous = array('i', [-1]) * len(blanks)
+        previous = -1
+        pending = 0
+        for index, blank in enumerate(blanks):
+            if not blank:
+                self.next[pending:index + 1] = array('i', [index]) * (index + 1 - pending)
+                pending = index + 1
+                previous = index
+            self.previous[index] = previous
+
+    def next_index(self, index: int):
+        """
+        :return: индекс первого не пробельного токена, начиная с index, или None, если его нет
+        """
+        if 0 <= index < len(self.next) and self.next[index] >= 0:
+            return self.next[index]
+        return None
+
+    def previous_index(self, index: int):
+        """
+        :return: индекс последнего не пробельного токена до index включительно или None, если его нет
+        """
+        if 0 <= index < len(self.previous) and self.previous[index] >= 0:
+            return self.previous[index]
+        return None
+
+    def __len__(self):
+        return len(self.next)
+
+
+class BracketPairs:
+    """
+    Таблица парных скобок готового списка токенов: `partner[i]` - индекс парной скобки для скобки с индексом i
+    и -1 для остальных токенов и скобок без пары. Учитываются `{}`, `()`, `[]` и угловые скобки generic типов,
+    которые токенизатор уже отметил как пунктуацию. Строится одним проходом после токенизации, для каждого вида скобок
+    свой стек, поэтому лишняя скобка одного вида не сбивает пары другого.
+    """
+    __slots__ = ("partner",)
+
+    _closing = {"}": "{", ")": "(", "]": "[", ">": "<"}
+
+    def __init__(self, tokens):
+        """
+        :param tokens: `TokenBuffer` или список токенов
+        """
+        if isinstance(tokens, TokenBuffer):
+            punctuation_code = _code_by_kind[KindToken.punctuation]
+            values = [tokens.values[value_id] for value_id in tokens.value_ids]
+            punctuation = [code == punctuation_code for code in tokens.kinds]
+        else:
+            values = [token.value for token in tokens]
+            punctuation = [token.kind == KindToken.punctuation for token in tokens]
+        self.partner = array('i', [-1]) * len(values)
+        stacks = {opening: [] for opening in self._closing.values()}
+        for index, value in enumerate(values):
+            if value in stacks:
+                if value != "<" or punctuation[index]:
+                    stacks[value].append(index)
+            elif value in self._closing and (value != ">" or punctuation[index]):
+                stack = stacks[self._closing[value]]
+                if stack:
+                    opening = stack.pop()
+                    self.partner[opening] = index
+                    self.partner[index] = opening
+
+    def match(self, index: int):
+        """
+        :return: индекс скобки, парной скобке с индексом index, или None, если пары нет
+        """
+        if 0 <= index < len(self.partner) and self.partner[index] >= 0:
+            return self.partner[index]
+        return None
+
+    def __len__(self):
+        return len(self.partner)
+
+
+# Биты флагов строки в `LineTable.flags`
+LINE_COMMENT = 1  # в строке есть комментарий
+LINE_BLANK = 2  # строка пустая или состоит только из табуляций и пробелов
+LINE_SAFE = 4  # с начала строки токенизацию можно начать заново
+
+
+class LineTable:
+    """
+    Таблица строк файла, которую токенизатор заполняет по ходу разбора. Для каждой строки хранит смещение её начала
+    в тексте, индекс первого токена после начала строки, количество табуляций и пробелов в отступе и длину строки
+    с учётом табуляций в столбцах array, а признаки строки - битами в bytearray `flags`.
+    Строка добавляется, как только токенизатор до неё дошёл, поэтому таблицу можно спрашивать и при потоковом разборе.
+    Строки нумеруются с 1, как line_index у токенов.
+    """
+
+    def __init__(self):
+        self.start_offsets = array('i')
+        self.first_tokens = array('i')
+        self.indent_tabs = array('i')
+        self.indent_spaces = array('i')
+        self.lengths = array('i')
+        self.flags = bytearray()
+
+    def _columns(self) -> tuple:
+        return self.start_offsets, self.first_tokens, self.indent_tabs, self.indent_spaces, self.lengths, self.flags
+
+    def append(self, start_offset: int, first_token: int, indent_tabs: int, indent_spaces: int, length: int,
+               blank: bool):
+        """
+        Добавляет строку в конец таблицы
+        :param start_offset: смещение начала строки в тексте
+        :param first_token: индекс первого токена, добавленного после начала строки
+        :param indent_tabs: количество табуляций в отступе
+        :param indent_spaces: количество пробелов в отступе
+        :param length: длина строки с учётом табуляций
+        :param blank: True, если строка состоит только из отступа
+        """
+        self.start_offsets.append(start_offset)
+        self.first_tokens.append(first_token)
+        self.indent_tabs.append(indent_tabs)
+        self.indent_spaces.append(indent_spaces)
+        self.lengths.append(length)
+        self.flags.append(LINE_BLANK if blank else 0)
+
+    def add_flag(self, line: int, flag: int):
+        self.flags[line - 1] |= flag
+
+    def has_comment(self, line: int) -> bool:
+        return bool(self.flags[line - 1] & LINE_COMMENT)
+
+    def is_blank(self, line: int) -> bool:
+        return bool(self.flags[line - 1] & LINE_BLANK)
+
+    def is_safe(self, line: int) -> bool:
+        return line <= len(self.flags) and bool(self.flags[line - 1] & LINE_SAFE)
+
+    def indentation(self, line: int) -> tuple:
+        """
+        :return: пара (количество табуляций, количество пробелов) в отступе строки
+        """
+        return self.indent_tabs[line - 1], self.indent_spaces[line - 1]
+
+    def head(self, count: int):
+        """
+        :return: новая таблица из первых count строк
+        """
+        table = LineTable()
+        for column, source in zip(table._columns(), self._columns()):
+            column.extend(source[:count])
+        return table
+
+    def truncate(self, count: int):
+        """
+        Оставляет в таблице только первые count строк
+        """
+        for column in self._columns():
+            del column[count:]
+
+    def extend(self, table, first_line: int, offset_shift=0, token_shift=0):
+        """
+        Дописывает в конец строки другой таблицы, начиная с first_line.
+        :param offset_shift: на сколько сдвинуть смещения начала дописанных строк
+        :param token_shift: на сколько сдвинуть индексы первых токенов дописанных строк
+        """
+        start = first_line - 1
+        start_offsets, first_tokens = table.start_offsets[start:], table.first_tokens[start:]
+        if offset_shift:
+            start_offsets = array('i', map(offset_shift.__add__, start_offsets))
+        if token_shift:
+            first_tokens = array('i', map(token_shift.__add__, first_tokens))
+        self.start_offsets.extend(start_offsets)
+        self.first_tokens.extend(first_tokens)
+        self.indent_tabs.extend(table.indent_tabs[start:])
+        self.indent_spaces.extend(table.indent_spaces[start:])
+        self.lengths.extend(table.lengths[start:])
+        self.flags.extend(table.flags[start:])
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __eq__(self, other):
+        return isinstance(other, LineTable) and self._columns() == other._columns()
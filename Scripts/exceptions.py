@@ -1,4 +1,3 @@
-import networkx as nx
 from Utils import Token
 
 
@@ -9,7 +8,7 @@ class NodeInGraphNotFound(Exception):
 
 
 class GraphNotFound(Exception):
-    def __init__(self, graph: nx.DiGraph):
+    def __init__(self, graph):
         message = f"Couldn't find {str(graph)} graph in linter's graphs."
         super().__init__(message)
 
@@ -24,3 +23,16 @@ class UnexpectedChar(Exception):
     def __init__(self, char: str, excerpt: str):
         message = "Undefined char = " + f'"{char}"\nLine was:' + f"...{excerpt}..."
         super().__init__(message)
+
+
+class StreamWindowExceeded(Exception):
+    def __init__(self, index: int, window: int):
+        message = f"Token {index} fell out of the token stream window (stream_window = {window}). " \
+                  f"Increase stream_window or turn off stream_tokens."
+        super().__init__(message)
+
+
+class UnknownRule(Exception):
+    def __init__(self, name: str, known: list):
+        message = f"Unknown rule {name!r}. Known rules: {', '.join(known)}."
+        super().__init__(message)
@@ -0,0 +1,16 @@
+namespace Vendored;
+
+public class Table
+{
+	private int size;
+
+	public void Fill(int value)
+	{
+		// LINTER:OFF offset
+		size = value;
+          size = size + 1;
+				size = size * 2;
+		// LINTER:ON offset
+		size = size - 1;
+	}
+}
@@ -1,6 +1,11 @@
 import unittest
+import json
+import shutil
+import subprocess
 import sys
 import os
+import tempfile
+from unittest import mock
 
 # parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 # scripts_path = os.path.join(parent_dir, 'Scripts')
@@ -17,8 +22,15 @@ scripts_path = os.path.join(parent_dir, 'Scripts')
 
 # Add the 'Scripts' directory to the search path
 sys.path.append(scripts_path)
-from Scripts.Linter import Linter, Settings
+from Scripts.Linter import Linter, Settings, Graphs, graph_registry, reload_graphs
+from Scripts.Suppressions import Suppressions
+from Scripts.GraphCompiler import Condition, OffsetCheck, compile_graph, load_graphs, read_graph, result_class
 from Scripts.exceptions import ErrorInLinterTest
+from Scripts.Benchmark import nested_blocks, lint_text, count_visits
+from Scripts.CSFile import CSFile
+from Scripts.Rules import CategoryStyleRule, UnknownRule, expand_rules, rules, select_rules
+from Scripts.Profiler import Profiler
+from Scripts.Scanner import MIN_STREAM_WINDOW, StreamWindowExceeded
 
 
 def get_link_to_file(file=None, line=None):
@@ -249,6 +261,53 @@ class TestLinterOffOn(unittest.TestCase):
         settings.indent_style.value = "space"
         self._test("Program.cs", settings)
 
+    def test_per_rule(self):
+        self._test("PerRule.cs")
+
+    def test_suppressions_index(self):
+        lines = ["a", "// LINTER:OFF", "b", "// LINTER:ON", "// LINTER:OFF offset, line", "c", "// LINTER:ON line",
+                 "d", "// LINTER:OFF vendored code", "e"]
+        suppressions = Suppressions(lines)
+        self.assertEqual({2: 4, 9: 10}, suppressions.region_ends)
+        self.assertEqual([False, True, True, True, False, False, False, False, True, True],
+                         [suppressions.is_suppressed(line) for line in range(1, 11)])
+        self.assertEqual([False, True, True, True, True, True, True, True, True, True],
+                         [suppressions.is_suppressed(line, "offset") for line in range(1, 11)])
+        self.assertFalse(suppressions.is_suppressed(8, "line"))
+        self.assertTrue(suppressions.is_suppressed(7, "line"))
+
+    def test_directive_outside_line_comment(self):
+        with open(directory_of_tests + "/Main/WithMistakes/while.cs", encoding="utf-8") as f:
+            text = f.read()
+        for engine, raw_text in [("table", True), ("table", False), ("legacy", False)]:
+            settings = Settings()
+            settings.tokenizer_engine.value = engine
+            settings.raw_text.value = raw_text
+            for prefix in ['string s = "LINTER:OFF";\n', "/* LINTER:OFF */\n", 'string s = "\\"LINTER:OFF";\n',
+                           "/*\n// LINTER:OFF\n*/\n"]:
+                with self.subTest(engine=engine, raw_text=raw_text, prefix=prefix):
+                    expected = [str(x) for x in lint_text(prefix.replace("LINTER", "ZZZZZZ") + text, settings)]
+                    self.assertTrue(expected)
+                    self.assertEqual(expected, [str(x).replace("LINTER", "ZZZZZZ")
+                                                for x in lint_text(prefix + text, settings)])
+
+    def test_rule_on_inside_global_region(self):
+        lines = ["a", "// LINTER:OFF", "b", "// LINTER:ON offset", "c", "// LINTER:ON", "d"]
+        suppressions = Suppressions(lines)
+        self.assertEqual({2: 6}, suppressions.region_ends)
+        self.assertEqual([False, True, True, True, True, True, False],
+                         [suppressions.is_suppressed(line) for line in range(1, 8)])
+        text = "class A\n{\n// LINTER:OFF\n  int a;\n// LINTER:ON offset\n  int b;\n// LINTER:ON\n\tint c;\n}\n"
+        self.assertEqual([], lint_text(text, Settings()))
+
+    def test_directives_in_line_comments_only(self):
+        lines = ['a = "// LINTER:OFF";', "/* LINTER:OFF", "// LINTER:OFF */", "*/", 'b = @"', '// LINTER:OFF"; c = 1;',
+                 'd = "http://x"; // LINTER:OFF offset', "e", "// LINTER:ON"]
+        suppressions = Suppressions(lines)
+        self.assertEqual({}, suppressions.region_ends)
+        self.assertEqual([7, 8, 9], [line for line in range(1, 10) if suppressions.is_suppressed(line, "offset")])
+        self.assertFalse(suppressions.is_suppressed(7))
+
     def _test(self, filename: str, settings=Settings()):
         directory = directory_of_tests + f"/LinterOffOn/{filename}"
         path = os.path.join(directory, directory)
@@ -267,3 +326,475 @@ class TestLinterOffOn(unittest.TestCase):
             self.assertEqual(0, len(linter.mismatches), msg)
         finally:
             linter.mismatches = []
+
+
+class TestStreamTokens(unittest.TestCase):
+    generic = "class A\n{\n\tpublic Func<" + ", ".join(["int"] * 20) + "> f;\n}\n"
+
+    def test_small_window(self):
+        settings = Settings()
+        settings.stream_tokens.value = True
+        settings.stream_window.value = MIN_STREAM_WINDOW - 1
+        with self.assertRaises(ValueError):
+            lint_text(self.generic, settings)
+
+    def test_generic_longer_than_window(self):
+        expected = [str(x) for x in lint_text(self.generic, Settings())]
+        settings = Settings()
+        settings.stream_tokens.value = True
+        self.assertEqual(expected, [str(x) for x in lint_text(self.generic, settings)])
+        settings.stream_window.value = MIN_STREAM_WINDOW
+        with self.assertRaises(StreamWindowExceeded):
+            lint_text(self.generic, settings)
+
+    def test_memory_bounded_by_window(self):
+        members = "".join(f"\tpublic int value{i};\n\n\tpublic void Run{i}()\n\t{{\n\t\tint a = {i};\n\t}}\n\n"
+                          for i in range(300))
+        text = "class A\n{\n" + members + "}\n"
+        expected = [str(x) for x in lint_text(text, Settings())]
+        settings = Settings()
+        settings.stream_tokens.value = True
+        settings.stream_window.value = 64
+        stream_class = sys.modules["Scanner"].TokenStream
+        pull = stream_class._pull
+        buffered = []
+
+        def counting_pull(stream, index):
+            pull(stream, index)
+            buffered.append(len(stream.buffer.kinds))
+
+        with mock.patch.object(stream_class, "_pull", counting_pull):
+            mismatches = lint_text(text, settings)
+        self.assertEqual(expected, [str(x) for x in mismatches])
+        self.assertGreater(len(buffered), 1000)
+        self.assertLessEqual(max(buffered), 3 * 64)
+
+    def test_clean_files(self):
+        for filename in ["test_clean_1.cs", "test_clean_2.cs", "test_clean_3.cs", "test_clean_4.cs"]:
+            with self.subTest(filename=filename):
+                self._test(directory_of_tests + f"/CleanFiles/{filename}")
+
+    def test_linter_off_on(self):
+        settings = Settings()
+        settings.indent_style.value = "space"
+        self._test(directory_of_tests + "/LinterOffOn/Program.cs", settings)
+
+    def _test(self, path: str, settings=None):
+        settings = settings or Settings()
+        settings.stream_tokens.value = True
+        settings.stream_window.value = 64
+        linter = Linter(settings)
+        try:
+            linter._analyze_file(path)
+        except Exception as e:
+            raise ErrorInLinterTest(get_link_to_file(path.replace("\\", "/"), 1)) from e
+        else:
+            msg = f"\n" + "-" * 30 + " FAILED " + "-" * 30 + "\n\nCSharp file: "
+            msg += f"{get_link_to_file(path.replace("\\", "/"), 1)}\n"
+            msg += f"Mismatches :\n"
+            for mismatch in linter.mismatches:
+                msg += str(mismatch) + "\n"
+            msg += "-" * 70 + "\n\n"
+            self.assertEqual(0, len(linter.mismatches), msg)
+        finally:
+            linter.mismatches = []
+
+
+class TestWhitespaceRuns(unittest.TestCase):
+
+    def test_same_mismatches_with_mistakes(self):
+        for filename in os.listdir(directory_of_tests + "/Main/WithMistakes"):
+            with self.subTest(filename=filename):
+                self._test(directory_of_tests + f"/Main/WithMistakes/{filename}", "tab")
+
+    def test_same_mismatches_in_offsets(self):
+        for filename in ["Mixed.cs", "Spaces.cs", "Tabs.cs"]:
+            for indent_style in ["tab", "space"]:
+                with self.subTest(filename=filename, indent_style=indent_style):
+                    self._test(directory_of_tests + f"/Whitespaces/{filename}", indent_style)
+
+    def _test(self, path: str, indent_style: str):
+        results = []
+        for whitespace_runs in [False, True]:
+            settings = Settings()
+            settings.indent_style.value = indent_style
+            settings.whitespace_runs.value = whitespace_runs
+            linter = Linter(settings)
+            linter._analyze_file(path)
+            results.append([(x.index_line, x.index, x.message) for x in linter.mismatches])
+        self.assertEqual(results[0], results[1])
+
+
+class TestCompiledGraphs(unittest.TestCase):
+
+    def test_same_as_gml(self):
+        linter = Linter(Settings())
+        for graphs, folder in [(linter.graphs, "Standards"), (linter.extension_graphs, "Extensions")]:
+            for key, compiled in graphs.items():
+                with self.subTest(graph=compiled.name):
+                    graph = read_graph(os.path.join(parent_dir, "Graphs", folder, compiled.name + ".gml"))
+                    self.assertEqual(key.value, compiled.name)
+                    self.assertEqual(compiled.fields(),
+                                     compile_graph(compiled.name, graph, Linter._keywords_to_func).fields())
+                    self.assertEqual(graph.number_of_nodes(), len(compiled.data))
+                    for node in graph.nodes:
+                        self.assertEqual(graph.nodes[node]["data"], compiled.data[node])
+                        self.assertEqual(set(graph.successors(node)) - {node}, set(compiled.successors[node]))
+                        self.assertEqual(graph.nodes[node]["data"] in Linter._keywords_to_func,
+                                         compiled.handlers[node] is not None)
+                    self.assertEqual([node for node in graph.nodes if graph.in_degree(node) == 0],
+                                     list(compiled.start_nodes))
+
+    def test_transitions(self):
+        import networkx as nx
+        graph = nx.DiGraph()
+        for node, data in enumerate(["a", "b", "c", "x", "x", "end_node"]):
+            graph.add_node(node, data=data, should_check_offset="default")
+        graph.add_edges_from([(0, 1), (0, 2), (1, 3), (2, 4), (3, 5), (4, 5)], condition="default")
+        compiled = compile_graph("test", graph, Linter._keywords_to_func)
+        self.assertEqual(("a", "b", "c", "x", "x", "end_node"), compiled.data)
+        self.assertEqual(((1, 2), (3,), (4,), (5,), (5,), ()), compiled.successors)
+        self.assertEqual((0,), compiled.start_nodes)
+        table, default, last_data = compiled.transitions[0][0]
+        self.assertEqual({"b": 1, "c": 2}, table)
+        self.assertIsNone(default)
+        table, default, last_data = compiled.transitions[3][0]
+        self.assertEqual({}, table)
+        self.assertEqual(5, default)
+        self.assertEqual((None,) * 4, compiled.transitions[5])
+
+    def test_dispatch_by_start_token(self):
+        linter = Linter(Settings())
+        automaton = linter._automaton
+        for key, graph in linter.graphs.items():
+            for node in graph.start_nodes:
+                with self.subTest(graph=graph.name, node=node):
+                    state = automaton.start_states[graph.data[node]]
+                    self.assertIs(graph, automaton.graphs[state])
+                    self.assertEqual(state, automaton.state(graph, graph.data[node]))
+                    self.assertEqual(graph.data[node], automaton.data[state])
+                    self.assertEqual(key, linter._define_name_of_graph(graph))
+        for graph in linter.extension_graphs.values():
+            offset = automaton.offsets[graph.name]
+            self.assertEqual(graph.data, automaton.data[offset:offset + len(graph.data)])
+            self.assertEqual([tuple(offset + successor for successor in successors) for successors in graph.successors],
+                             list(automaton.successors[offset:offset + len(graph.data)]))
+
+    def test_conditions(self):
+        graph = read_graph(os.path.join(parent_dir, "Graphs", "Standards", "do_while.gml"))
+        compiled = compile_graph("do_while", graph, Linter._keywords_to_func)
+        conditions = [condition for node_conditions in compiled.conditions for condition in node_conditions]
+        self.assertEqual(len(conditions), graph.number_of_edges())
+        self.assertIn(Condition.true, conditions)
+        self.assertIn(Condition.false, conditions)
+        self.assertIn(OffsetCheck.false, compiled.offset_checks)
+        node = next(node for node, conditions in enumerate(compiled.conditions) if Condition.true in conditions)
+        for res_of_keyword_func, condition in [(True, Condition.true), (False, Condition.false)]:
+            table, default, _ = compiled.transitions[node][result_class(res_of_keyword_func)]
+            allowed = [successor for successor, edge in zip(compiled.successors[node], compiled.conditions[node])
+                       if edge in (condition, Condition.default)]
+            self.assertEqual(set(allowed), set(table.values()) | ({default} - {None}))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            graphs_directory = os.path.join(directory, "Standards")
+            shutil.copytree(os.path.join(parent_dir, "Graphs", "Standards"), graphs_directory)
+            cache_path = os.path.join(directory, "compiled.pickle")
+            fresh, = load_graphs([graphs_directory], Linter._keywords_to_func)
+            compiled, = load_graphs([graphs_directory], Linter._keywords_to_func, cache_path)
+            self.assertTrue(os.path.exists(cache_path))
+            cached, = load_graphs([graphs_directory], Linter._keywords_to_func, cache_path)
+            self.assertEqual(list(fresh), list(cached))
+            for name in fresh:
+                self.assertEqual(fresh[name].fields(), compiled[name].fields())
+                self.assertEqual(fresh[name].fields(), cached[name].fields())
+                self.assertEqual(fresh[name].handlers, cached[name].handlers)
+
+            gml_path = os.path.join(graphs_directory, "if.gml")
+            with open(gml_path, encoding="utf8") as f:
+                text = f.read()
+            with open(gml_path, "w", encoding="utf8") as f:
+                f.write(text.replace('data "if"', 'data "iff"'))
+            changed, = load_graphs([graphs_directory], Linter._keywords_to_func, cache_path)
+            self.assertIn("iff", changed["if"].start_index)
+
+            with open(cache_path, "wb") as f:
+                f.write(b"broken")
+            rebuilt, = load_graphs([graphs_directory], Linter._keywords_to_func, cache_path)
+            self.assertEqual(changed["if"].fields(), rebuilt["if"].fields())
+
+            # Кэш со ссылкой на переименованный класс или удалённый модуль
+            for stale in [b"cGraphCompiler\nRenamedGraph\n.", b"cremoved_module\nCompiledGraph\n."]:
+                with open(cache_path, "wb") as f:
+                    f.write(stale)
+                rebuilt, = load_graphs([graphs_directory], Linter._keywords_to_func, cache_path)
+                self.assertEqual(changed["if"].fields(), rebuilt["if"].fields())
+
+            # Папка для кэша недоступна для записи
+            unwritable, = load_graphs([graphs_directory], Linter._keywords_to_func,
+                                      os.path.join(gml_path, "compiled.pickle"))
+            self.assertEqual(changed["if"].fields(), unwritable["if"].fields())
+
+    def test_shared_registry(self):
+        first, second = Linter(Settings()), Linter(Settings())
+        self.assertIs(first.graphs, second.graphs)
+        self.assertIs(first.extension_graphs, second.extension_graphs)
+        with self.assertRaises(TypeError):
+            first.graphs[Graphs.if_] = None
+
+        registry = graph_registry()
+        reloaded = reload_graphs()
+        self.assertIsNot(registry, reloaded)
+        self.assertIs(reloaded, graph_registry())
+        self.assertIs(reloaded.graphs, Linter(Settings()).graphs)
+        self.assertIs(registry.graphs, first.graphs)
+        self.assertEqual([graph.fields() for graph in registry.graphs.values()],
+                         [graph.fields() for graph in reloaded.graphs.values()])
+
+    def test_linting_without_networkx(self):
+        reload_graphs()
+        code = ("import sys\nfrom Linter import Linter\nfrom Settings import Settings\n"
+                "assert 'networkx' not in sys.modules\n"
+                f"Linter(Settings())._analyze_file({directory_of_tests + '/Main/Clean/if_else.cs'!r})\n"
+                "print(sorted(name for name in sys.modules if name.startswith('networkx')))")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=scripts_path)
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertEqual("[]", result.stdout.strip())
+
+
+class TestDeepNesting(unittest.TestCase):
+
+    def test_nested_blocks(self):
+        settings = Settings()
+        settings.hard_wrap_at.value = 2000
+        for braces in [True, False]:
+            with self.subTest(braces=braces):
+                self.assertEqual([], lint_text(nested_blocks(300, braces), settings))
+
+    def test_mismatch_inside_nested_blocks(self):
+        text = nested_blocks(300).replace("\t" * 300 + "a = 1;", "\t" * 299 + "a = 1;")
+        settings = Settings()
+        settings.hard_wrap_at.value = 2000
+        mismatches = lint_text(text, settings)
+        self.assertEqual([601], [mismatch.index_line for mismatch in mismatches])
+
+
+class TestSignificantTokens(unittest.TestCase):
+
+    def test_same_as_linear_scan(self):
+        for filename in os.listdir(directory_of_tests + "/Main/WithMistakes"):
+            with self.subTest(filename=filename):
+                file = CSFile(directory_of_tests + f"/Main/WithMistakes/{filename}", Settings())
+                blanks = [token.kind.name == "whiteSpace" for token in file.tokens]
+                significant = file.significant_tokens
+                for index in range(len(blanks)):
+                    following = next((i for i in range(index, len(blanks)) if not blanks[i]), None)
+                    previous = next((i for i in range(index, -1, -1) if not blanks[i]), None)
+                    self.assertEqual(following, significant.next_index(index))
+                    self.assertEqual(previous, significant.previous_index(index))
+
+    def test_fewer_token_visits(self):
+        settings = Settings()
+        for filename in ["test_clean_1.cs", "test_clean_4.cs"]:
+            with self.subTest(filename=filename):
+                path = directory_of_tests + f"/CleanFiles/{filename}"
+                self.assertLess(count_visits(path, settings, True), count_visits(path, settings, False))
+
+
+class TestBracketPairs(unittest.TestCase):
+
+    def test_pairs(self):
+        for filename in os.listdir(directory_of_tests + "/Main/WithMistakes"):
+            with self.subTest(filename=filename):
+                file = CSFile(directory_of_tests + f"/Main/WithMistakes/{filename}", Settings())
+                pairs = file.bracket_pairs
+                for index, token in enumerate(file.tokens):
+                    partner = pairs.match(index)
+                    if partner is not None:
+                        self.assertEqual(index, pairs.match(partner))
+                        self.assertIn(file.tokens[min(index, partner)].value + file.tokens[max(index, partner)].value,
+                                      ["{}", "()", "[]", "<>"])
+
+    def test_generic_angle_brackets(self):
+        path = directory_of_tests + "/CleanFiles/test_angle_brackets.cs"
+        file = CSFile(path, Settings())
+        angles = [index for index, token in enumerate(file.tokens)
+                  if token.value == "<" and token.kind.name == "punctuation"]
+        self.assertTrue(angles)
+        for index in angles:
+            self.assertEqual(">", file.tokens[file.bracket_pairs.match(index)].value)
+
+
+class TestMismatch(unittest.TestCase):
+
+    def test_lazy_message(self):
+        settings = Settings()
+        settings.indent_style.value = "tab"
+        mismatches = lint_text("class A\n{\n  int a;\n}\n", settings)
+        self.assertTrue(mismatches)
+        mismatch = mismatches[0]
+        self.assertFalse(hasattr(mismatch, "__dict__"))
+        self.assertEqual("  int a;", mismatch.line)
+        self.assertEqual(f"Expected {mismatch.expected}, but was '{mismatch.value}'. Created by _check_offset\n",
+                         mismatch.message)
+        self.assertEqual("offset", mismatch.rule)
+        self.assertEqual(f"index = {mismatch.index} Line 3: " + mismatch.line, str(mismatch).split("\n")[0])
+
+    def test_texts_per_file(self):
+        settings = Settings()
+        settings.hard_wrap_at.value = 10
+        linter = Linter(settings)
+        with tempfile.TemporaryDirectory() as directory:
+            sizes = []
+            for index in range(3):
+                path = os.path.join(directory, f"file_{index}.cs")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("class A\n{\n    int " + "a" * (10 + index) + ";\n}\n")
+                linter._analyze_file(path)
+                sizes.append(len(linter.texts))
+                self.assertIn(f"Too long line({20 + index} > 10).", [x.message.split(" Created")[0]
+                                                                      for x in linter.mismatches])
+                self.assertTrue(all(x.texts is linter.texts for x in linter.mismatches))
+                linter._reset()
+        self.assertEqual(1, len(set(sizes)))
+
+
+class TestMismatchBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.text = nested_blocks(20).replace("\t", "    ")
+        self.settings = Settings()
+        self.all_mismatches = lint_text(self.text, self.settings)
+
+    def test_max_mismatches(self):
+        self.settings.max_mismatches.value = 10
+        mismatches = lint_text(self.text, self.settings)
+        self.assertEqual([str(x) for x in self.all_mismatches[:10]], [str(x) for x in mismatches])
+
+    def test_max_mismatches_per_rule(self):
+        self.settings.max_mismatches_per_rule.value = 3
+        mismatches = lint_text(self.text, self.settings)
+        rules = [mismatch.rule for mismatch in mismatches]
+        self.assertTrue(rules)
+        self.assertTrue(all(rules.count(rule) <= 3 for rule in rules))
+
+    def _report(self, linter):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Budget.cs")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.text)
+            linter.file_to_save_mismatches = os.path.join(directory, "mismatches.txt")
+            linter._analyze_file(path)
+            with open(linter.file_to_save_mismatches, encoding="utf-8") as f:
+                return f.read()
+
+    def test_suppressed_count(self):
+        self.settings.max_mismatches.value = 10
+        linter = Linter(self.settings)
+        report = self._report(linter)
+        self.assertGreater(len(self.all_mismatches), 10 * 32)
+        self.assertEqual(len(self.all_mismatches) - 10, linter.suppressed_mismatches)
+        self.assertIn(f"\n{linter.suppressed_mismatches} more mismatches suppressed.\n", report)
+
+    def test_suppressed_count_per_rule(self):
+        self.settings.max_mismatches_per_rule.value = 3
+        linter = Linter(self.settings)
+        report = self._report(linter)
+        self.assertEqual(len(self.all_mismatches) - len(linter.mismatches), linter.suppressed_mismatches)
+        self.assertIn(f"\n{linter.suppressed_mismatches} more mismatches suppressed.\n", report)
+
+
+class TestRules(unittest.TestCase):
+
+    def test_disabled_rule_same_as_filtered(self):
+        for filename in ["class.cs", "get_set.cs", "switch_case.cs"]:
+            path = directory_of_tests + f"/Main/WithMistakes/{filename}"
+            linter = Linter(Settings())
+            linter._analyze_file(path)
+            for name in list(rules) + ["NR", "analyze"]:
+                with self.subTest(filename=filename, rule=name):
+                    settings = Settings()
+                    settings.disabled_rules.value = name
+                    reduced = Linter(settings)
+                    reduced._analyze_file(path)
+                    disabled = expand_rules([name])
+                    self.assertEqual([str(x) for x in linter.mismatches if x.rule not in disabled],
+                                     [str(x) for x in reduced.mismatches])
+
+    def test_rule_names(self):
+        names = set()
+        for filename in ["class.cs", "get_set.cs", "switch_case.cs"]:
+            linter = Linter(Settings())
+            linter._analyze_file(directory_of_tests + f"/Main/WithMistakes/{filename}")
+            names |= {mismatch.rule for mismatch in linter.mismatches}
+        self.assertTrue({"layout", "block_layout", "extra_whitespace"} <= names)
+        self.assertTrue(names <= set(rules))
+        for internal in ["check_tokens_by_graph", "add_mismatches_in_range", "order_token_by_array"]:
+            self.assertNotIn(internal, rules)
+
+    def test_select_rules(self):
+        self.assertEqual(frozenset(rules), select_rules("all", "none"))
+        self.assertEqual({"offset", "naming"}, select_rules("offset, NR", "none"))
+        self.assertEqual(frozenset(rules) - {"final_newline", "line_length", "naming"}, select_rules("all", "analyze"))
+        with self.assertRaises(UnknownRule):
+            select_rules("all", "spelling")
+
+    def test_category(self):
+        mismatches = lint_text("class A\n{\n\tpublic int value;\n  int count;\n}\n", Settings())
+        categories = {mismatch.rule: mismatch.category for mismatch in mismatches}
+        self.assertIs(CategoryStyleRule.NR, categories["naming"])
+        self.assertIs(CategoryStyleRule.FR, categories["offset"])
+        for mismatch in mismatches:
+            self.assertIs(rules[mismatch.rule].category, mismatch.category)
+
+    def test_linter_off_group(self):
+        lines = ["// LINTER:OFF analyze", "a"]
+        suppressions = Suppressions(lines)
+        self.assertTrue(suppressions.is_suppressed(2, "naming"))
+        self.assertFalse(suppressions.is_suppressed(2, "offset"))
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_same_mismatches(self):
+        path = directory_of_tests + "/Main/WithMistakes/if_else.cs"
+        linter = Linter(Settings())
+        linter._analyze_file(path)
+        profiler = Profiler()
+        profiled = Linter(Settings(), profiler=profiler)
+        profiled._analyze_file(path)
+        self.assertEqual([str(x) for x in linter.mismatches], [str(x) for x in profiled.mismatches])
+        for name in ["graph if", "keyword block", "check _check_offset", "check _check_empty_line"]:
+            self.assertIn(name, profiler.stats)
+        for calls, total, own in profiler.stats.values():
+            self.assertGreater(calls, 0)
+            self.assertLessEqual(own, total + 1e-9)
+        self.assertEqual([], profiler._children)
+
+    def test_aggregated_json(self):
+        profiler = Profiler()
+        linter = Linter(Settings(), profiler=profiler)
+        linter._analyze_file(directory_of_tests + "/Main/Clean/if_else.cs")
+        calls = profiler.stats["graph if"][0]
+        linter._reset()
+        linter._analyze_file(directory_of_tests + "/Main/Clean/if_else.cs")
+        self.assertEqual(2 * calls, profiler.stats["graph if"][0])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.json")
+            profiler.save_json(path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(2 * calls, json.load(f)["graph if"]["calls"])
+
+    def test_budget(self):
+        settings = Settings()
+        settings.max_mismatches.value = 5
+        profiler = Profiler()
+        linter = Linter(settings, profiler=profiler)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Budget.cs")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(nested_blocks(20).replace("\t", "    "))
+            linter._analyze_file(path)
+        self.assertEqual(5, len(linter.mismatches))
+        self.assertGreater(linter.suppressed_mismatches, 0)
+        self.assertEqual([], profiler._children)
@@ -1,6 +1,7 @@
 import unittest
 import sys
 import os
+import tempfile
 
 current_dir = os.path.dirname(__file__)
 parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
@@ -9,6 +10,8 @@ sys.path.append(parent_dir + '/Scripts')
 from Scripts.Tokenizer import Tokenizer, KindToken
 from Scripts.Utils import CustomList
 from Scripts.Settings import Settings
+from Scripts.Scanner import Scanner, TokenStream, compare_with_tokenizer, iter_source_files, literal_end
+from Scripts.Benchmark import nested_generics, comparison_chain, big_literal
 
 
 directory_of_tests = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "TestFiles/Tokenizer")
@@ -65,6 +68,12 @@ class TestTokenizer(unittest.TestCase):
              KindToken.whiteSpace,
              KindToken.identifier, KindToken.punctuation], [x.kind for x in tokenizer.tokens])
 
+    def test_kind_keyword_for(self):
+        line = "for (i = 0; i < 1; i++)"
+        tokenizer = Tokenizer(CustomList(repr(line)[1:-1]), Settings(), [line])
+        self.assertEqual(KindToken.keyword, tokenizer.tokens[0].kind)
+        self.assertEqual(KindToken.operator, tokenizer.tokens[-2].kind)
+
     def test_tabs(self):
         with open(directory_of_tests + "/test_tabs.cs", "r", encoding="utf-8") as f:
             data = f.read()
@@ -99,3 +108,181 @@ class TestTokenizer(unittest.TestCase):
         tokenizer = Tokenizer(CustomList(repr(line)[1:-1]), Settings(), [line])
         self.assertEqual(KindToken.punctuation, tokenizer.tokens[5].kind)
         self.assertEqual(KindToken.punctuation, tokenizer.tokens[7].kind)
+
+
+class TestScannerDifferential(unittest.TestCase):
+    def test_same_tokens_as_tokenizer(self):
+        for path in iter_source_files(os.path.dirname(directory_of_tests)):
+            with self.subTest(path=path):
+                self.assertEqual([], compare_with_tokenizer(path, Settings()))
+
+    def test_same_tokens_as_tokenizer_raw(self):
+        for path in iter_source_files(os.path.dirname(directory_of_tests)):
+            with self.subTest(path=path):
+                self.assertEqual([], compare_with_tokenizer(path, Settings(), raw=True))
+
+    def test_raw_line_width(self):
+        settings = Settings()
+        settings.hard_wrap_at.value = 12
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "wrap.cs")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("class a\n{\n\t\tint b = 'x';\n\tstring c = \"\\t\";\n}")
+            self.assertEqual([], compare_with_tokenizer(path, settings, raw=True))
+            with open(path, "r", encoding="utf-8") as f:
+                data = f.read()
+            tokenizer = Scanner(data, settings, data.split("\n"), raw=True)
+        self.assertEqual([(3, 20), (4, 20)], tokenizer.too_long_lines)
+
+
+class TestScannerAngleBrackets(unittest.TestCase):
+    def test_deep_generics(self):
+        text = nested_generics(400, 2)
+        tokenizer = Scanner(text, Settings(), text.split("\n"), raw=True)
+        kinds = {x.kind for x in tokenizer.tokens if x.value in "<>"}
+        self.assertEqual({KindToken.punctuation}, kinds)
+        self.assertEqual(800, len([x for x in tokenizer.tokens if x.value == ">"]))
+
+    def test_long_comparison_chain(self):
+        text = comparison_chain(3000)
+        tokenizer = Scanner(text, Settings(), text.split("\n"), raw=True)
+        self.assertEqual([KindToken.operator] * 3000, [x.kind for x in tokenizer.tokens if x.value == ">"])
+
+    def test_nothing_before_angle_bracket(self):
+        for line in ["<a> b", "> a", "  <a>"]:
+            with self.subTest(line=line):
+                expected = Tokenizer(CustomList(line), Settings(), [line])
+                actual = Scanner(line, Settings(), [line])
+                self.assertEqual([(x.value, x.kind) for x in expected.tokens],
+                                 [(x.value, x.kind) for x in actual.tokens])
+
+
+class TestScannerRawText(unittest.TestCase):
+    def test_same_values_as_escaped(self):
+        with open(directory_of_tests + "/test_multiple_lines.cs", "r", encoding="utf-8") as f:
+            data = f.read()
+        tokenizer = Scanner(data, Settings(), data.split("\n"), raw=True)
+        self.assertEqual([x.value for x in tokenizer.tokens],
+                         ["class", " ", "aboba", "\\n", "{", "\\n", "\\t", "private", " ", "static", " ", "string",
+                          " ", "abc", ";", "\\n", "}"])
+
+    def test_real_offsets(self):
+        data = "\t\tvar a = 'x';\n/* a\nb */ c"
+        tokenizer = Scanner(data, Settings(), data.split("\n"), raw=True)
+        self.assertEqual([(x.value, x.line_index, x.start_index) for x in tokenizer.tokens],
+                         [("\\t", 1, 0), ("\\t", 1, 1), ("var", 1, 2), (" ", 1, 5), ("a", 1, 6), (" ", 1, 7),
+                          ("=", 1, 8), (" ", 1, 9), ("'x'", 1, 10), (";", 1, 13), ("\\n", 1, 14), ("\\n", 3, 2),
+                          (" ", 3, 4), ("c", 3, 5)])
+        self.assertEqual([2, 3], tokenizer.lines_with_comments)
+
+    def test_whitespace_runs(self):
+        settings = Settings()
+        settings.whitespace_runs.value = True
+        data = "{\n\t\tint  a;\n \t}"
+        tokenizer = Scanner(data, settings, data.split("\n"), raw=True)
+        self.assertEqual([(x.value, x.kind, x.start_index) for x in tokenizer.tokens],
+                         [("{", KindToken.punctuation, 0), ("\\n", KindToken.whiteSpace, 1),
+                          ("\\t\\t", KindToken.whiteSpace, 0), ("int", KindToken.keyword, 2),
+                          (" ", KindToken.whiteSpace, 5), (" ", KindToken.whiteSpace, 6), ("a", KindToken.identifier, 7),
+                          (";", KindToken.punctuation, 8), ("\\n", KindToken.whiteSpace, 9),
+                          (" \\t", KindToken.whiteSpace, 0), ("}", KindToken.punctuation, 2)])
+
+    def test_string_literals(self):
+        literals = ['"a\\"b"', "'\\''", '@"a""b\nc"', '$"{(a ? "x" : "y")} {{z}}"', '$@"{a}""\n"',
+                    '"""\nq "" "\n"""', '$$"""{{a}}"""', '$"{$"{1}"}"', '"a\\\\"']
+        for literal in literals:
+            with self.subTest(literal=literal):
+                self.assertEqual(len(literal), literal_end(literal + " x", 0))
+        self.assertEqual(4, literal_end('"abc', 0))
+
+    def test_big_literals(self):
+        for kind in ["regular", "verbatim", "raw"]:
+            with self.subTest(kind=kind):
+                data = big_literal(kind, 100000)
+                lines = data.split("\n")
+                tokenizer = Scanner(data, Settings(), lines, raw=True)
+                literals = [x for x in tokenizer.tokens if x.kind == KindToken.literal]
+                self.assertEqual(1, len(literals))
+                self.assertEqual(1, literals[0].line_index)
+                after = next(x for x in tokenizer.tokens if x.value == "after")
+                self.assertEqual(len(lines) - 1, after.line_index)
+
+    def test_line_table(self):
+        data = "{\n\t\tint a; // x\n \t\n/* a\n b */ c;\n}"
+        tokenizer = Scanner(data, Settings(), data.split("\n"), raw=True)
+        table = tokenizer.line_table
+        self.assertEqual(6, len(table))
+        self.assertEqual([0, 2, 16, 19, 24, 33], list(table.start_offsets))
+        self.assertEqual([0, 2, 10, 13, 13, 18], list(table.first_tokens))
+        self.assertEqual((2, 0), table.indentation(2))
+        self.assertEqual((1, 1), table.indentation(3))
+        self.assertEqual([False, True, False, True, True, False], [table.has_comment(i) for i in range(1, 7)])
+        self.assertEqual([False, False, True, False, False, False], [table.is_blank(i) for i in range(1, 7)])
+        self.assertEqual([1, 19, 5, 4, 8, 1], list(table.lengths))
+        self.assertFalse(table.is_safe(5))
+
+
+class TestTokenBuffer(unittest.TestCase):
+    def test_view(self):
+        line = "var a = a;"
+        tokenizer = Scanner(line, Settings(), [line], raw=True)
+        tokens = tokenizer.tokens
+        self.assertEqual(8, len(tokens))
+        self.assertEqual(tokens.value_ids[2], tokens.value_ids[6])
+        self.assertEqual(["var", " ", "a", " ", "=", " ", "a", ";"], [x.value for x in tokens])
+        self.assertEqual(";", tokens[-1].value)
+        self.assertIsNone(tokens.at(8))
+        tokens[4].kind = KindToken.punctuation
+        self.assertEqual(KindToken.punctuation, tokens.kind(4))
+
+
+class TestScannerUpdate(unittest.TestCase):
+    edits = [["List<int> x = a < b;"], ["/*"], ["\tint y = 2;", "// LINTER:OFF"], ["Dictionary<string, List<int>> m;"], []]
+
+    def test_same_as_full_tokenize(self):
+        settings = Settings()
+        for path in iter_source_files(os.path.dirname(directory_of_tests)):
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")
+            for edit in self.edits:
+                index = len(lines) // 2
+                new_lines = lines[:index] + edit + lines[index + 1:]
+                text = "\n".join(new_lines)
+                with self.subTest(path=path, edit=edit):
+                    tokenizer = Scanner("\n".join(lines), settings, lines, raw=True)
+                    tokenizer.update(text, index + 1, index + len(edit))
+                    expected = Scanner(text, settings, text.split("\n"), raw=True)
+                    self.assertEqual([(x.value, x.kind, x.line_index, x.start_index) for x in expected.tokens],
+                                     [(x.value, x.kind, x.line_index, x.start_index) for x in tokenizer.tokens])
+                    for name in ["line_lengths", "too_long_lines", "lines_with_comments", "line_table"]:
+                        self.assertEqual(getattr(expected, name), getattr(tokenizer, name))
+
+    def test_edit_in_the_middle(self):
+        lines = ["class A", "{", "\tint a;", "\tint b;", "\tint c;", "}"]
+        tokenizer = Scanner("\n".join(lines), Settings(), lines, raw=True)
+        lines[3] = "\tlong b;"
+        tokenizer.update("\n".join(lines), 4, 4)
+        self.assertEqual(["\\t", "long", " ", "b", ";", "\\n", "\\t", "int"],
+                         [x.value for x in tokenizer.tokens[tokenizer.line_table.first_tokens[3]:][:8]])
+        self.assertEqual([0, 4, 6, 12, 18, 24], list(tokenizer.line_table.first_tokens))
+        self.assertTrue(all(tokenizer.line_table.is_safe(line) for line in range(1, 7)))
+
+
+class TestTokenStream(unittest.TestCase):
+    def test_same_tokens_as_eager(self):
+        settings = Settings()
+        settings.stream_window.value = 32
+        for path in iter_source_files(os.path.dirname(directory_of_tests)):
+            with open(path, "r", encoding="utf-8") as f:
+                data = f.read()
+            eager = Scanner(data, settings, data.split("\n"), raw=True)
+            stream = TokenStream(Scanner(data, settings, data.split("\n"), raw=True, lazy=True))
+            index = 0
+            with self.subTest(path=path):
+                while stream.at(index) is not None:
+                    token = stream[index]
+                    self.assertEqual((eager.tokens[index].value, eager.tokens[index].kind),
+                                     (token.value, token.kind))
+                    index += 1
+                self.assertEqual(len(eager.tokens), index)
+                self.assertLess(len(stream.buffer.kinds), 3 * 32 + 1)